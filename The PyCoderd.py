@@ -1,79 +1,2383 @@
-import tkinter as tk
-from tkinter import messagebox, ttk
+import time
+STARTED_AT = time.perf_counter()  # Launch, for the startup timings; taken before the other imports on purpose
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt  # Matplotlib is still included for future use
+import argparse
+import csv
+import functools
+import gc
+import json
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from collections.abc import Sequence
+from contextlib import contextmanager
+from http import HTTPStatus
+import heapq
+import importlib
+import itertools
+import math
+import operator
+import glob
+import os
+import pickle
+import queue
+import random
+import re
+import struct
+import sys
+import threading
+import types
+
+MAX_REMINDER_DELAY_MS = 60 * 60 * 1000  # Re-check at least hourly so clock changes are picked up
+PRIORITIES = ["Emergency", "Urgent", "Normal"]  # Triage levels, highest first
+DEPARTMENTS = ["General OPD", "Cardiology", "Neurology", "Pediatrics", "Orthopedics"]
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hospital.db")
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hospital_data")
+STORAGE = os.environ.get("HMS_STORAGE", "journal")  # "journal" (snapshot + journal) or "sqlite"
+COLUMNAR = os.environ.get("HMS_COLUMNAR") == "1"  # Array-backed appointments and billing
+COLD_START_TARGET_SECONDS = 3.0  # Snapshot load + journal replay budget for 1M records
+LOGIN_TARGET_SECONDS = 1.0  # Launch until the login window is drawn
+MAIN_WINDOW_TARGET_SECONDS = 1.0  # Login until the main window is drawn and usable (data may still be loading)
+PRELOAD_DELAY_MS = 2000  # After startup, heavy modules for later tabs are imported in the background
+PRELOAD_MODULES = ("matplotlib.figure", "matplotlib.backends.backend_tkagg")
+FLUSH_INTERVAL_MS = 1000  # How often the service commits pending writes
+MAX_NOTIFICATIONS = 200  # Older reminder lines are dropped from the notification list
+WARD_TYPES = ["General", "ICU", "Maternity", "Pediatric", "Surgical", "Isolation"]
+SLOT_MINUTES = 15  # Length of one appointment
+WORKING_HOURS = (9 * 60, 17 * 60)  # Clinic opening and closing, in minutes after midnight
+WORKING_DAYS = (0, 1, 2, 3, 4, 5)  # Monday to Saturday
+SLOT_SEARCH_DAYS = 60  # How far ahead the free-slot search looks
+SERVICE_ADDRESS = os.environ.get("HMS_SERVICE")  # host:port of a shared service; unset, each window runs its own
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_BACKLOG = 1024
+SERVICE_IDLE_TIMEOUT = 60  # Seconds a kept-alive connection may sit idle
+SERVICE_WORKERS = 4  # Threads the window uses to call the service
+SERVICE_THREADS = 8  # Threads the service runs core calls on
+RESPONSE_POLL_MS = 20  # How often the window picks up finished service calls
+SYNC_INTERVAL_MS = 2000  # How often the window re-reads lists and reminders changed by other desks
+DASHBOARD_POINTS = 500  # Occupancy points per ward sent to the dashboard
+SEARCH_LIMIT = 50  # Results returned by one search
+SEARCH_SCAN_LIMIT = 20000  # Most postings a full-text search scores for its rarest word
+SEARCH_DELAY_MS = 150  # Typing pause before a search box queries the service
+WORD = re.compile(r"\w+")  # Full-text search terms
+METRICS_SAMPLE_EVERY = int(os.environ.get("HMS_METRICS", "1"))  # Time every n-th call; 0 turns instrumentation off
+METRICS_FILE = os.environ.get("HMS_METRICS_FILE")  # Prometheus text file the window keeps up to date
+METRICS_EXPORT_MS = 15000  # How often that file is rewritten
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # Seconds
+HEARTBEAT_MS = 100  # Stall watchdog beat
+STALL_THRESHOLD_MS = 250  # A beat this late counts as a UI stall
+MAX_STALLS = 100  # Stalls kept for the diagnostics tab
+
+class Record:
+    # Slotted record base; subscript access keeps the old dict-style record["field"] callers working.
+    # Every subclass's __init__ takes its fields in slot order, so cls(*record._values(record)) rebuilds a record
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._values = operator.attrgetter(*cls.__slots__)  # All field values as a tuple, in slot order
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+    def __setitem__(self, field, value):
+        setattr(self, field, value)
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __getstate__(self):
+        # Pickle the values alone, compactly
+        return self._values(self)
+
+    def __setstate__(self, values):
+        # The inverse: unpickling fills the slots without running __init__
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.as_dict()})"
+
+class Patient(Record):
+    __slots__ = ("id", "name", "age", "gender", "ailment", "token")
+
+    def __init__(self, id, name, age, gender, ailment, token):
+        self.id = id
+        self.name = name
+        self.age = age
+        self.gender = sys.intern(gender)
+        self.ailment = sys.intern(ailment)
+        self.token = token
+
+class Doctor(Record):
+    __slots__ = ("id", "name", "specialization", "contact")
+
+    def __init__(self, id, name, specialization, contact):
+        self.id = id
+        self.name = name
+        self.specialization = sys.intern(specialization)
+        self.contact = contact
+
+class Appointment(Record):
+    __slots__ = ("patient_id", "doctor_id", "appointment_time")
+
+    def __init__(self, patient_id, doctor_id, appointment_time):
+        self.patient_id = patient_id
+        self.doctor_id = doctor_id
+        self.appointment_time = appointment_time
+
+class BillingRecord(Record):
+    __slots__ = ("patient_id", "registration_charge", "medicine_cost", "billed_at", "doctor_id")
+
+    def __init__(self, patient_id, registration_charge, medicine_cost, billed_at=None, doctor_id=None):
+        self.patient_id = patient_id
+        self.registration_charge = registration_charge
+        self.medicine_cost = medicine_cost
+        self.billed_at = billed_at
+        self.doctor_id = doctor_id  # Doctor the revenue is attributed to: the patient's latest appointment when billed
+
+    @property
+    def total_cost(self):  # Derived, not stored
+        return self.registration_charge + self.medicine_cost
+
+class Token(Record):
+    __slots__ = ("token", "patient_id", "priority", "department", "issued_at", "called_at")
+
+    def __init__(self, token, patient_id, priority, department, issued_at, called_at=None):
+        self.token = token
+        self.patient_id = patient_id
+        self.priority = sys.intern(priority)
+        self.department = sys.intern(department)
+        self.issued_at = issued_at
+        self.called_at = called_at
+
+class EntityStore:
+    # Keeps records in insertion order with a primary-key index and secondary indexes; folded indexes
+    # are keyed by the casefolded value, for case-insensitive lookups
+    def __init__(self, key=None, indexes=(), folded=()):
+        self.records = []
+        self.key = key
+        self.by_key = {}  # Primary key -> record
+        self.indexes = {field: {} for field in indexes}  # Field -> {value: [records]}
+        self.folded = {field: {} for field in folded}  # Field -> {casefolded value: [records]}
+
+    def add(self, record):
+        self.records.append(record)
+        if self.key is not None:
+            self.by_key[getattr(record, self.key)] = record
+        for field, index in self.indexes.items():
+            value = getattr(record, field)
+            records = index.get(value)
+            if records is None:
+                index[value] = [record]
+            else:
+                records.append(record)
+        for field, index in self.folded.items():
+            value = getattr(record, field).casefold()
+            records = index.get(value)
+            if records is None:
+                index[value] = [record]
+            else:
+                records.append(record)
+        return record
+
+    def extend(self, records):
+        # add() for a list of records, e.g. when loading a snapshot
+        self.records.extend(records)
+        if self.key is not None:
+            self.by_key.update(zip(map(operator.attrgetter(self.key), records), records))
+        for indexes, fold in ((self.indexes, False), (self.folded, True)):
+            for field, index in indexes.items():
+                for value, record in zip(map(operator.attrgetter(field), records), records):
+                    if fold:
+                        value = value.casefold()
+                    group = index.get(value)
+                    if group is None:
+                        index[value] = [record]
+                    else:
+                        group.append(record)
+
+    def get(self, key):
+        return self.by_key.get(key)
+
+    def lookup(self, field, value):
+        return self.indexes[field].get(value, [])
+
+    def lookup_folded(self, field, value):
+        return self.folded[field].get(value.casefold(), [])
+
+    def count_folded(self, field, value):
+        return len(self.lookup_folded(field, value))
+
+    def lookup_range(self, field, low, high):
+        # Records with low <= field <= high, in order of the field; for fields with few distinct values like age
+        index = self.indexes[field]
+        return itertools.chain.from_iterable(index[key] for key in sorted(key for key in index if low <= key <= high))
+
+    def count_range(self, field, low, high):
+        return sum(len(records) for key, records in self.indexes[field].items() if low <= key <= high)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+class ColumnStore:
+    # Array-backed table for bulky, mostly numeric records. Each column is a typed array
+    # ("T" stores datetimes as epoch seconds, None stores interned strings/objects) and rows are
+    # handed out as short-lived record objects built on access. Same interface as EntityStore.
+    def __init__(self, record_type, columns, indexes=()):
+        self.record_type = record_type
+        self.fields = [field for field, _ in columns]
+        self.kinds = [typecode for _, typecode in columns]
+        self.columns = [array("d") if typecode == "T" else array(typecode) if typecode else [] for typecode in self.kinds]
+        self.indexes = {field: {} for field in indexes}  # Field -> {value: array of row numbers}
+        self.records = ColumnRows(self)
+
+    def add(self, record):
+        row = len(self.columns[0])
+        for field, kind, column in zip(self.fields, self.kinds, self.columns):
+            value = getattr(record, field)
+            if kind == "T":
+                column.append(value.timestamp() if value is not None else float("nan"))
+            elif kind is None and isinstance(value, str):
+                column.append(sys.intern(value))
+            else:
+                column.append(value)
+        for field, index in self.indexes.items():
+            value = getattr(record, field)
+            rows = index.get(value)
+            if rows is None:
+                rows = index[value] = array("l")
+            rows.append(row)
+        return self.row(row)
+
+    def row(self, row):
+        values = [(datetime.fromtimestamp(column[row]) if column[row] == column[row] else None) if kind == "T" else column[row] for kind, column in zip(self.kinds, self.columns)]
+        return self.record_type(*values)
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    def get(self, key):
+        return None  # Column tables have no primary key
+
+    def lookup(self, field, value):
+        return [self.row(row) for row in self.indexes[field].get(value, ())]
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __iter__(self):
+        return iter(self.records)
+
+class ColumnRows(Sequence):
+    # Read-only list view over a ColumnStore so getters can keep returning "a list of records"
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.row(row) for row in range(*index.indices(len(self.store)))]
+        if index < 0:
+            index += len(self.store)
+        if not 0 <= index < len(self.store):
+            raise IndexError(index)
+        return self.store.row(index)
+
+class PrefixIndex(Sequence):
+    # Records kept in case-insensitive order of one text field, for type-ahead prefix search and sorted
+    # listings. Adds only append to a pending list; queries fold pending rows into a small sorted run,
+    # and that into the main sorted run once it passes an eighth of its size, so bulk imports stay O(1)
+    # per row and a search is a couple of bisects. A run is (records, casefolded keys): sorts, merges
+    # and bisects compare the stored keys, so each value is folded once rather than on every merge.
+    def __init__(self, field):
+        self.field = field
+        self.main = ([], [])
+        self.recent = ([], [])
+        self.pending = []
+        self.lock = threading.Lock()  # Searches reorganise the runs, and may run concurrently
+
+    def keys(self, records):
+        return list(map(str.casefold, map(operator.attrgetter(self.field), records)))
+
+    def add(self, record):
+        self.pending.append(record)
+
+    @staticmethod
+    def _merge(run, records, keys):
+        # run followed by records, as one sorted run; ties keep run's records first
+        keys = run[1] + keys
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        records = run[0] + records
+        return list(map(records.__getitem__, order)), list(map(keys.__getitem__, order))
+
+    def tidy(self):
+        with self.lock:
+            if len(self.pending) <= 64:
+                records, keys = self.recent
+                for record, key in zip(self.pending, self.keys(self.pending)):
+                    position = bisect_right(keys, key)
+                    records.insert(position, record)
+                    keys.insert(position, key)
+            else:
+                self.recent = self._merge(self.recent, self.pending, self.keys(self.pending))
+            self.pending = []
+            if len(self.recent[0]) > max(1024, len(self.main[0]) // 8):
+                self.main = self._merge(self.main, *self.recent)
+                self.recent = ([], [])
+            return self.main, self.recent
+
+    def count(self, prefix):
+        prefix = prefix.casefold()
+        return sum(bisect_left(keys, prefix + "\U0010ffff") - bisect_left(keys, prefix) for _, keys in self.tidy())
+
+    def search(self, prefix):
+        # Records whose field starts with prefix (any case), in order
+        prefix = prefix.casefold()
+        def matches(run):
+            records, keys = run
+            for position in range(bisect_left(keys, prefix), len(keys)):
+                if not keys[position].startswith(prefix):
+                    return
+                yield keys[position], records[position]
+        main, recent = self.tidy()
+        return map(operator.itemgetter(1), heapq.merge(matches(main), matches(recent), key=operator.itemgetter(0)))
+
+    def __len__(self):
+        return len(self.main[0]) + len(self.recent[0]) + len(self.pending)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1 or None][0]
+        start, stop, _ = index.indices(len(self))
+        main, recent = self.tidy()
+        main_keys, recent_keys = main[1], recent[1]
+        # How many of the first `start` rows in merged order come from main (main wins ties, as in merge)
+        low, high = max(0, start - len(recent_keys)), min(start, len(main_keys))
+        while low < high:
+            split = (low + high) // 2
+            if main_keys[split] <= recent_keys[start - split - 1]:
+                low = split + 1
+            else:
+                high = split
+        merged = heapq.merge(self._tail(main, low), self._tail(recent, start - low), key=operator.itemgetter(0))
+        return [record for _, record in itertools.islice(merged, max(0, stop - start))]
+
+    @staticmethod
+    def _tail(run, first):
+        # (key, record) pairs of run from position first, without copying the lists
+        records, keys = run
+        for position in range(first, len(records)):
+            yield keys[position], records[position]
+
+    def ordered(self):
+        # Copies of the sorted records, for snapshots
+        main, recent = self.tidy()
+        return list(main[0]), list(recent[0])
+
+    def restore(self, main, recent):
+        # Put back records saved by ordered(), sparing the sort
+        with self.lock:
+            self.main, self.recent, self.pending = (main, self.keys(main)), (recent, self.keys(recent)), []
+
+class TextIndex:
+    # Inverted index over free text: term -> (document numbers, term counts), both growing arrays in
+    # document order. Search returns documents containing every query word, best BM25 score first; the
+    # last word may be unfinished and matches any term it starts.
+    K1 = 1.2
+    B = 0.75
 
-class HospitalManagementSystem:
     def __init__(self):
-        # In-memory data structures
-        self.patients = []
-        self.doctors = []
-        self.appointments = []
-        self.feedbacks = []
-        self.complaints = []
-        self.billing_records = []
-        self.token_queue = []  # List to manage tokens
-        self.wards = {}  # Dictionary to hold ward information
+        self.postings = {}
+        self.lengths = array("l")  # Terms per document
+        self.total_length = 0
+        self.vocabulary = []  # Sorted terms, for expanding the last query word
+
+    def add(self, text):
+        document = len(self.lengths)
+        counts = {}
+        for term in WORD.findall(text.casefold()):
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array("l"), array("l"))
+                insort(self.vocabulary, term)
+            entry[0].append(document)
+            entry[1].append(count)
+        length = sum(counts.values())
+        self.lengths.append(length)
+        self.total_length += length
+
+    def expand(self, prefix, limit=50):
+        start = bisect_left(self.vocabulary, prefix)
+        return list(itertools.takewhile(lambda term: term.startswith(prefix), itertools.islice(self.vocabulary, start, start + limit)))
+
+    def search(self, query, limit=SEARCH_LIMIT, scan=SEARCH_SCAN_LIMIT):
+        words = WORD.findall(query.casefold())
+        if not words or not self.lengths:
+            return []
+        documents = len(self.lengths)
+        average = self.total_length / documents
+        groups = []  # One list of (documents, counts, idf) per query word; any of its terms matches the word
+        for terms in [[word] for word in words[:-1]] + [self.expand(words[-1])]:
+            group = [self.postings[term] + (math.log(1 + (documents - len(self.postings[term][0]) + 0.5) / (len(self.postings[term][0]) + 0.5)),) for term in terms if term in self.postings]
+            if not group:
+                return []
+            groups.append(group)
+
+        def weight(idf, count, document):
+            return idf * count * (self.K1 + 1) / (count + self.K1 * (1 - self.B + self.B * self.lengths[document] / average))
+
+        # Score candidates from the rarest word, newest documents first when it is very common
+        rarest = min(groups, key=lambda group: sum(len(entry[0]) for entry in group))
+        scores = {}
+        for found, counts, idf in rarest:
+            for position in range(max(0, len(found) - scan // len(rarest)), len(found)):
+                document = found[position]
+                scores[document] = scores.get(document, 0.0) + weight(idf, counts[position], document)
+        for group in groups:
+            if group is rarest or not scores:
+                continue
+            low, high = min(scores), max(scores)
+            extra = {}
+            for found, counts, idf in group:
+                # Walk the postings between the first and last candidate, or bisect per candidate if that is less work
+                first, last = bisect_left(found, low), bisect_right(found, high)
+                if last - first <= len(scores):
+                    for position in range(first, last):
+                        document = found[position]
+                        if document in scores:
+                            extra[document] = extra.get(document, 0.0) + weight(idf, counts[position], document)
+                else:
+                    for document in scores:
+                        position = bisect_left(found, document, first, last)
+                        if position < last and found[position] == document:
+                            extra[document] = extra.get(document, 0.0) + weight(idf, counts[position], document)
+            scores = {document: scores[document] + value for document, value in extra.items()}
+        return [document for document, _ in heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))]
+
+class ReminderScheduler:
+    # Appointments ordered by time in a heap so each tick only touches reminders that are due. Entries carry the
+    # appointment's position in its store, which is what gets persisted once it has been reminded.
+    def __init__(self, window=timedelta(days=1)):
+        self.window = window  # Remind this long before the appointment
+        self.heap = []
+        self.sent = set()  # Positions of appointments already reminded; their heap entries are skipped
+
+    def add(self, appointment, position):
+        heapq.heappush(self.heap, (appointment.appointment_time, position, appointment))  # Positions are unique, so records are never compared
+
+    def rebuild(self, appointments, now, sent=()):
+        # Re-create the heap in O(n) from upcoming appointments not yet reminded, e.g. after loading a snapshot.
+        # Sent positions of past appointments are forgotten: nothing would remind them again anyway.
+        sent = set(sent)
+        self.heap = [(appointment.appointment_time, position, appointment) for position, appointment in enumerate(appointments) if appointment.appointment_time >= now and position not in sent]
+        heapq.heapify(self.heap)
+        self.sent = {position for position in sent if appointments[position].appointment_time >= now}
+
+    def next_due(self):
+        # Time at which the earliest pending reminder becomes due, or None when nothing is pending
+        if self.heap:
+            return self.heap[0][0] - self.window
+        return None
 
-    def add_patient(self, name, age, gender, ailment):
-        patient_id = len(self.patients) + 1  # Simple ID generation
-        token_number = len(self.token_queue) + 1  # Generate token number
-        self.patients.append({"id": patient_id, "name": name, "age": age, "gender": gender, "ailment": ailment, "token": token_number})
-        self.token_queue.append(token_number)  # Add token to the queue
+    def pop_due(self, now):
+        # Each appointment leaves the heap exactly once; ones already in the past or already reminded are dropped
+        # silently. Returns [(position, appointment)] and counts them as sent.
+        due = []
+        while self.heap and self.heap[0][0] - self.window <= now:
+            appointment_time, position, appointment = heapq.heappop(self.heap)
+            if appointment_time >= now and position not in self.sent:
+                self.sent.add(position)
+                due.append((position, appointment))
+        return due
+
+class IdAllocator:
+    # Hands out increasing integers under a lock; a value is never handed out twice, even after deletes
+    def __init__(self, last=0):
+        self.last = last
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            self.last += 1
+            return self.last
+
+    def observe(self, value):
+        # Called for restored records so their values are skipped from now on
+        with self.lock:
+            if value > self.last:
+                self.last = value
+
+class RWLock:
+    # Many readers or one writer; waiting writers go first so a steady stream of reads cannot starve them.
+    # Both sides are re-entrant per thread and the writer may also read, but a reader cannot upgrade.
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.condition = threading.Condition(self.mutex)
+        self.read_depth = {}  # Reading thread id -> nesting depth
+        self.waiting_writers = 0
+        self.writer = None  # Thread id holding the write lock
+        self.writes = 0  # Writer's nesting depth
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        if self.writer == me:
+            return
+        with self.mutex:
+            depth = self.read_depth.get(me, 0)
+            if not depth:
+                while self.writer is not None or self.waiting_writers:
+                    self.condition.wait()
+            self.read_depth[me] = depth + 1
+
+    def release_read(self):
+        me = threading.get_ident()
+        if self.writer == me:
+            return
+        with self.mutex:
+            depth = self.read_depth.pop(me) - 1
+            if depth:
+                self.read_depth[me] = depth
+            elif not self.read_depth:
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self.writer == me:
+            self.writes += 1
+            return
+        with self.mutex:
+            if me in self.read_depth:
+                raise RuntimeError("cannot take the write lock while holding a read lock")
+            self.waiting_writers += 1
+            while self.writer is not None or self.read_depth:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writer = me
+            self.writes = 1
+
+    def release_write(self):
+        self.writes -= 1
+        if not self.writes:
+            with self.mutex:
+                self.writer = None
+                self.condition.notify_all()
+
+    @contextmanager
+    def reading(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def writing(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+def read_locked(method):
+    # Runs a HospitalManagementSystem method under its shared (read) lock
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        self.lock.acquire_read()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.lock.release_read()
+    locked.read_only = True  # Changes nothing, so a client may safely send it twice
+    return locked
+
+def write_locked(method):
+    # Runs a HospitalManagementSystem method under its exclusive (write) lock
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        lock = self.lock
+        if lock.writer == threading.get_ident():  # Called from another locked method
+            return method(self, *args, **kwargs)
+        lock.acquire_write()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_write()
+    return locked
+
+class Histogram:
+    __slots__ = ("calls", "sampled", "total", "maximum", "counts")
+
+    def __init__(self, buckets):
+        self.calls = 0  # Every call, timed or not
+        self.sampled = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.counts = [0] * (len(buckets) + 1)  # Per bucket, not cumulative; the last one is +Inf
+
+class Metrics:
+    # Call counts and latency histograms per instrumented call, plus the UI stalls the watchdog saw.
+    # Cheap enough to leave on: one short lock per call, and with sample_every = n only every n-th call
+    # is timed; sample_every = 0 turns recording off.
+    def __init__(self, sample_every=1, buckets=LATENCY_BUCKETS):
+        self.sample_every = sample_every
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.slowest = {}  # UI handler -> longest run since the watchdog's last beat (Tk thread only)
+        self.stalls = deque(maxlen=MAX_STALLS)  # (when, seconds, culprits)
+        self.stall_count = 0
+        self.stall_seconds = 0.0
+
+    def timed(self, name, function, ui=False):
+        # Wraps function so each call is counted and, when sampled, timed under name. UI handlers are always
+        # timed (they run at human pace) and remembered for stall reports.
+        histogram = self.histograms.setdefault(name, Histogram(self.buckets))
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            every = self.sample_every
+            if not every:
+                return function(*args, **kwargs)
+            uncounted = 1
+            if every > 1 and not ui:
+                with self.lock:
+                    histogram.calls += 1
+                    skip = histogram.calls % every
+                if skip:
+                    return function(*args, **kwargs)
+                uncounted = 0
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.observe(histogram, elapsed, uncounted)
+                if ui and elapsed > self.slowest.get(name, 0.0):
+                    self.slowest[name] = elapsed
+        return wrapper
+
+    def observe(self, histogram, seconds, calls=0):
+        with self.lock:
+            histogram.calls += calls
+            histogram.sampled += 1
+            histogram.total += seconds
+            histogram.counts[bisect_left(self.buckets, seconds)] += 1
+            if seconds > histogram.maximum:
+                histogram.maximum = seconds
+
+    def record(self, name, seconds):
+        # One measurement taken outside a timed wrapper, e.g. a startup phase
+        with self.lock:
+            histogram = self.histograms.setdefault(name, Histogram(self.buckets))
+        self.observe(histogram, seconds, 1)
+
+    def take_slowest(self, limit=3):
+        # The slowest UI handlers since the previous call, slowest first
+        slowest, self.slowest = self.slowest, {}
+        return heapq.nlargest(limit, ((seconds, name) for name, seconds in slowest.items()))
+
+    def record_stall(self, seconds, culprits, log=None):
+        with self.lock:
+            self.stall_count += 1
+            self.stall_seconds += seconds
+            self.stalls.append((datetime.now(), seconds, culprits))
+        if log is not None:
+            print(f"UI stall: event loop blocked {seconds * 1000:.0f} ms; {culprits}", file=log)
+
+    def quantile(self, histogram, fraction):
+        # Upper bound of the bucket holding that fraction of the timed calls (the maximum for the last bucket)
+        rank = fraction * histogram.sampled
+        seen = 0
+        for bound, count in zip(self.buckets, histogram.counts):
+            seen += count
+            if seen >= rank and seen:
+                return min(bound, histogram.maximum)
+        return histogram.maximum
+
+    def summary(self):
+        # [(name, calls, timed calls, p50, p99, max)] in seconds, busiest first
+        with self.lock:
+            rows = [(name, histogram.calls, histogram.sampled, self.quantile(histogram, 0.50), self.quantile(histogram, 0.99), histogram.maximum) for name, histogram in self.histograms.items() if histogram.calls]
+        return sorted(rows, key=lambda row: -row[1])
+
+    def prometheus(self):
+        # Prometheus text exposition format (version 0.0.4)
+        with self.lock:
+            histograms = [(name, histogram.calls, histogram.sampled, histogram.total, list(histogram.counts)) for name, histogram in sorted(self.histograms.items()) if histogram.calls]
+            stall_count, stall_seconds = self.stall_count, self.stall_seconds
+        lines = ["# HELP hms_calls_total Calls of each instrumented method or handler, timed or not.", "# TYPE hms_calls_total counter"]
+        lines += [f'hms_calls_total{{call="{name}"}} {calls}' for name, calls, _, _, _ in histograms]
+        lines += ["# HELP hms_call_seconds Latency of the timed (sampled) calls.", "# TYPE hms_call_seconds histogram"]
+        for name, _, sampled, total, counts in histograms:
+            for bound, cumulative in zip(self.buckets, itertools.accumulate(counts)):
+                lines.append(f'hms_call_seconds_bucket{{call="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'hms_call_seconds_bucket{{call="{name}",le="+Inf"}} {sampled}')
+            lines.append(f'hms_call_seconds_sum{{call="{name}"}} {total}')
+            lines.append(f'hms_call_seconds_count{{call="{name}"}} {sampled}')
+        lines += ["# HELP hms_ui_stalls_total Times the window's event loop was blocked past the stall threshold.", "# TYPE hms_ui_stalls_total counter", f"hms_ui_stalls_total {stall_count}"]
+        lines += ["# HELP hms_ui_stall_seconds_total Time the window's event loop spent in those stalls.", "# TYPE hms_ui_stall_seconds_total counter", f"hms_ui_stall_seconds_total {stall_seconds}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, extra=""):
+        # Replaced atomically so a collector reading the file never sees half of it
+        with open(path + ".tmp", "w", encoding="utf-8") as target:
+            target.write(self.prometheus() + extra)
+        os.replace(path + ".tmp", path)
+
+def instrument(cls, prefix, names=None, skip=(), ui=False, metrics=None):
+    # Replaces the public methods of cls (or just names) with timed wrappers recorded as "<prefix>.<method>".
+    # Does nothing when instrumentation was switched off at startup, so it then costs nothing at all.
+    metrics = metrics or METRICS
+    if not metrics.sample_every:
+        return
+    for name, function in list(vars(cls).items()):
+        if isinstance(function, types.FunctionType) and not name.startswith("_") and name not in skip and (names is None or name in names):
+            setattr(cls, name, metrics.timed(f"{prefix}.{name}", function, ui))
+
+METRICS = Metrics(METRICS_SAMPLE_EVERY)
+
+class TokenQueue:
+    # One FIFO deque per (department, priority); stats are updated on every issue/call, never rescanned
+    def __init__(self, departments=DEPARTMENTS):
+        self.tokens = IdAllocator()  # Token numbers are never reused
+        self.departments = {}
+        self.waiting = {}  # Token -> entry for tokens not yet called, in issue order
+        for department in departments:
+            self.add_department(department)
+
+    def add_department(self, department):
+        if department not in self.departments:
+            self.departments[department] = {"queues": {priority: deque() for priority in PRIORITIES}, "waiting": 0, "served": 0, "total_wait": 0.0, "served_times": deque()}
+
+    def issue(self, patient_id, priority="Normal", department="General OPD", now=None):
+        self.add_department(department)
+        token = self.tokens.next()
+        entry = Token(token, patient_id, priority, department, now or datetime.now())
+        counter = self.departments[department]
+        counter["queues"][priority].append(entry)
+        counter["waiting"] += 1
+        self.waiting[token] = entry
+        return token
+
+    def call_next(self, department=None, now=None):
+        # Highest priority first; within a priority the oldest token across the chosen departments wins
+        departments = [self.departments[department]] if department else self.departments.values()
+        for priority in PRIORITIES:
+            heads = [counter for counter in departments if counter["queues"][priority]]
+            if heads:
+                counter = min(heads, key=lambda c: c["queues"][priority][0]["token"])
+                entry = counter["queues"][priority].popleft()
+                self._record_served(counter, entry, now or datetime.now())
+                return entry
+        return None
 
-    def add_doctor(self, name, specialization, contact):
-        doctor_id = len(self.doctors) + 1  # Simple ID generation
-        self.doctors.append({"id": doctor_id, "name": name, "specialization": specialization, "contact": contact})
+    def _record_served(self, counter, entry, now):
+        del self.waiting[entry["token"]]
+        entry["called_at"] = now
+        counter["waiting"] -= 1
+        counter["served"] += 1
+        counter["total_wait"] += (now - entry["issued_at"]).total_seconds()
+        served_times = counter["served_times"]
+        served_times.append(now)
+        while served_times[0] <= now - timedelta(hours=1):
+            served_times.popleft()
+
+    def stats(self, department=None, now=None):
+        now = now or datetime.now()
+        counters = [self.departments[department]] if department else list(self.departments.values())
+        waiting = sum(counter["waiting"] for counter in counters)
+        served = sum(counter["served"] for counter in counters)
+        total_wait = sum(counter["total_wait"] for counter in counters)
+        last_hour = now - timedelta(hours=1)
+        for counter in counters:
+            while counter["served_times"] and counter["served_times"][0] <= last_hour:
+                counter["served_times"].popleft()
+        return {"waiting": waiting, "served": served, "average_wait": total_wait / served if served else 0.0, "served_last_hour": sum(len(counter["served_times"]) for counter in counters)}
+
+    def restore(self, entry):
+        # Put a persisted, not yet called token back in its queue without allocating a new number
+        self.add_department(entry["department"])
+        self.tokens.observe(entry["token"])
+        counter = self.departments[entry["department"]]
+        counter["queues"][entry["priority"]].append(entry)
+        counter["waiting"] += 1
+        self.waiting[entry["token"]] = entry
+
+    def restore_waiting(self, entries):
+        # restore() for a whole waiting list in issue order, e.g. a snapshot's; the caller observes token numbers
+        for department in {entry.department for entry in entries}:
+            self.add_department(department)
+        departments = self.departments
+        for entry in entries:
+            departments[entry.department]["queues"][entry.priority].append(entry)
+        for counter in departments.values():
+            counter["waiting"] = sum(map(len, counter["queues"].values()))
+        self.waiting.update(zip(map(operator.attrgetter("token"), entries), entries))
+
+    def restore_call(self, entry):
+        # Replay a journaled call; the called token is normally at the head of its queue
+        waiting = self.waiting.get(entry["token"])
+        if waiting is None:
+            return
+        counter = self.departments[waiting["department"]]
+        queue = counter["queues"][waiting["priority"]]
+        if queue[0] is waiting:
+            queue.popleft()
+        else:
+            queue.remove(waiting)
+        self._record_served(counter, waiting, entry["called_at"])
+
+    def counters(self):
+        # Plain copy of each department's running stats, for snapshots; restore_stats() takes them back
+        return {department: (counter["served"], counter["total_wait"], list(counter["served_times"])) for department, counter in self.departments.items()}
+
+    def restore_stats(self, department, served, total_wait, served_times, last_token=0):
+        # Seed the running stats from persisted aggregates; served_times must be in call order
+        self.add_department(department)
+        counter = self.departments[department]
+        counter["served"] += served
+        counter["total_wait"] += total_wait
+        counter["served_times"].extend(served_times)
+        self.tokens.observe(last_token)
+
+    def __len__(self):
+        return len(self.waiting)
+
+class Ward(Record):
+    # Individual beds: a heap of free bed numbers (lowest first) and bed -> patient id for occupied ones
+    __slots__ = ("name", "total_beds", "ward_type", "free_beds", "occupants")
+
+    def __init__(self, name, total_beds, ward_type="General", free_beds=None, occupants=None):
+        self.name = name
+        self.total_beds = total_beds
+        self.ward_type = sys.intern(ward_type)
+        self.free_beds = list(range(1, total_beds + 1)) if free_beds is None else free_beds
+        self.occupants = {} if occupants is None else occupants
+
+    @property
+    def occupied_beds(self):
+        return len(self.occupants)
+
+    @property
+    def free_count(self):
+        return len(self.free_beds)
+
+    def occupy(self, patient_id, bed=None):
+        # Takes the lowest free bed, or a specific one when replaying history
+        if bed is None or self.free_beds[0] == bed:
+            bed = heapq.heappop(self.free_beds)
+        else:
+            self.free_beds.remove(bed)
+            heapq.heapify(self.free_beds)
+        self.occupants[bed] = patient_id
+        return bed
+
+    def release(self, bed):
+        del self.occupants[bed]
+        heapq.heappush(self.free_beds, bed)
+
+    def summary(self):
+        # Counts only, for listings and exports; the bed heap and occupant map stay internal
+        return {"ward_name": self.name, "ward_type": self.ward_type, "total_beds": self.total_beds, "occupied_beds": self.occupied_beds, "free_beds": self.free_count}
+
+class BedAvailability:
+    # Max-heaps of (-free beds, ward name), one over all wards and one per ward type. Entries are
+    # pushed on every change and stale ones are discarded lazily, so each update and query is O(log n).
+    def __init__(self):
+        self.heaps = {}  # Ward type (None for all wards) -> heap
+
+    def update(self, ward, wards):
+        for ward_type in (None, ward.ward_type):
+            heap = self.heaps.setdefault(ward_type, [])
+            heapq.heappush(heap, (-ward.free_count, ward.name))
+            if len(heap) > 4 * len(wards) + 64:  # Too many stale entries; rebuild from current counts
+                heap[:] = [(-other.free_count, other.name) for other in wards.values() if ward_type in (None, other.ward_type)]
+                heapq.heapify(heap)
+
+    def best(self, wards, ward_type=None):
+        # Ward with the most free beds, or None when every bed is taken
+        heap = self.heaps.get(ward_type, [])
+        while heap:
+            free, name = heap[0]
+            if -free == wards[name].free_count:
+                return wards[name] if free else None
+            heapq.heappop(heap)
+        return None
 
-    def schedule_appointment(self, patient_id, doctor_id, appointment_time):
-        self.appointments.append({"patient_id": patient_id, "doctor_id": doctor_id, "appointment_time": appointment_time})
+class BookingError(Exception):
+    pass
+
+class BookingEngine:
+    # Sorted slot-start lists per doctor and per patient (as whole minutes since 1970-01-01), so a
+    # conflict check is a single bisect and the free-slot search only walks bookings after the start time
+    EPOCH = datetime(1970, 1, 1)
+    EPOCH_DAY = EPOCH.toordinal()
+
+    def __init__(self, slot_minutes=SLOT_MINUTES, working_hours=WORKING_HOURS, working_days=WORKING_DAYS):
+        self.slot = slot_minutes
+        self.day_start, self.day_end = working_hours
+        self.working_days = frozenset(working_days)
+        self.by_doctor = {}  # Doctor id -> sorted slot starts
+        self.by_patient = {}  # Patient id -> sorted slot starts
+        self.by_specialization = {}  # Casefolded specialization -> doctor ids
+
+    def minutes(self, moment):
+        # Same as (moment - EPOCH) // timedelta(minutes=1) for naive times, without building two timedeltas
+        return (moment.toordinal() - self.EPOCH_DAY) * 1440 + moment.hour * 60 + moment.minute
+
+    def moment(self, minutes):
+        return self.EPOCH + timedelta(minutes=minutes)
+
+    def add_doctor(self, doctor):
+        self.by_specialization.setdefault(doctor.specialization.casefold(), []).append(doctor.id)
+
+    def check(self, patient_id, doctor_id, appointment_time):
+        # Returns the slot start, which book() reuses. Imports call this once per row, so minutes(), the
+        # working-hours test and the two conflict bisects are inlined.
+        start = (appointment_time.toordinal() - self.EPOCH_DAY) * 1440 + appointment_time.hour * 60 + appointment_time.minute
+        day, minute = divmod(start, 1440)
+        if not ((day + 3) % 7 in self.working_days and self.day_start <= minute and minute + self.slot <= self.day_end):  # 1970-01-01 was a Thursday
+            raise BookingError("Appointment is outside working hours.")
+        low, high = start - self.slot + 1, start + self.slot  # A booking starting in [low, high) overlaps
+        starts = self.by_doctor.get(doctor_id)
+        if starts and starts[-1] >= low and starts[bisect_left(starts, low)] < high:
+            raise BookingError("The doctor is already booked at that time.")
+        starts = self.by_patient.get(patient_id)
+        if starts and starts[-1] >= low and starts[bisect_left(starts, low)] < high:
+            raise BookingError("The patient already has an appointment at that time.")
+        return start
+
+    def book(self, appointment, start=None):
+        # start is the value check() returned for the same time, when the caller has it
+        if start is None:
+            start = self.minutes(appointment.appointment_time)
+        insort(self.by_doctor.setdefault(appointment.doctor_id, []), start)
+        insort(self.by_patient.setdefault(appointment.patient_id, []), start)
+
+    def next_working_slot(self, start):
+        # First slot on the working grid at or after start
+        day, minute = divmod(start, 1440)
+        for _ in range(8):
+            if (day + 3) % 7 in self.working_days:
+                offset = max(minute, self.day_start) - self.day_start
+                slot_start = self.day_start + -(-offset // self.slot) * self.slot
+                if slot_start + self.slot <= self.day_end:
+                    return day * 1440 + slot_start
+            day, minute = day + 1, 0
+        return None
 
+    def free_slots(self, doctor_id, start, end):
+        # Yields free slot starts for one doctor in [start, end), skipping only the bookings in between
+        booked = self.by_doctor.get(doctor_id, [])
+        index = bisect_left(booked, start - self.slot + 1)
+        slot = self.next_working_slot(start)
+        while slot is not None and slot < end:
+            while index < len(booked) and booked[index] + self.slot <= slot:
+                index += 1
+            if index < len(booked) and booked[index] < slot + self.slot:
+                slot = self.next_working_slot(booked[index] + self.slot)
+                continue
+            yield slot, doctor_id
+            slot = self.next_working_slot(slot + self.slot)
+
+    def find_free_slots(self, specialization, after, count=5, days=SLOT_SEARCH_DAYS):
+        # Earliest free slots across every doctor of a specialization, merged lazily by time
+        start = self.minutes(after) + (1 if after.second or after.microsecond else 0)
+        end = start + days * 1440
+        merged = heapq.merge(*(self.free_slots(doctor_id, start, end) for doctor_id in self.by_specialization.get(specialization.casefold(), ())))
+        return [(self.moment(slot), doctor_id) for slot, doctor_id in itertools.islice(merged, count)]
+
+class Analytics:
+    # Aggregates updated as each billing, appointment and bed change happens, so the dashboard never
+    # recomputes from history. Ad-hoc questions over the full history go through the NumPy queries below.
+    def __init__(self):
+        self.revenue_by_day = {}  # date -> total billed
+        self.revenue_by_doctor = {}  # doctor id -> total billed (doctor of the patient's latest appointment)
+        self.revenue_by_specialization = {}
+        self.registration_total = 0
+        self.medicine_total = 0
+        self.appointments_by_day = {}
+        self.ward_occupancy = {}  # ward -> (array of epoch seconds, array of occupied beds)
+
+    def observe(self, op, record, hms):
+        if op == "add_billing":
+            self.registration_total += record.registration_charge
+            self.medicine_total += record.medicine_cost
+            total = record.total_cost
+            if record.billed_at is not None:
+                day = record.billed_at.date()
+                self.revenue_by_day[day] = self.revenue_by_day.get(day, 0) + total
+            if record.doctor_id is not None:
+                doctor = hms.get_doctor(record.doctor_id)
+                self.revenue_by_doctor[doctor.id] = self.revenue_by_doctor.get(doctor.id, 0) + total
+                self.revenue_by_specialization[doctor.specialization] = self.revenue_by_specialization.get(doctor.specialization, 0) + total
+        elif op == "schedule_appointment":
+            day = record.appointment_time.date()
+            self.appointments_by_day[day] = self.appointments_by_day.get(day, 0) + 1
+        elif op in ("add_ward", "assign_bed", "discharge") and record.get("at") is not None:  # SQLite restores current beds without a time; its history is loaded separately
+            self.record_occupancy(record["ward_name"], record["at"], record["occupied_beds"])
+
+    def state(self):
+        # Plain copies of the aggregates, for snapshots
+        state = {name: value.copy() if isinstance(value, dict) else value for name, value in vars(self).items()}
+        state["ward_occupancy"] = {ward: (times[:], occupied[:]) for ward, (times, occupied) in self.ward_occupancy.items()}
+        return state
+
+    def load_state(self, state):
+        vars(self).update(state)
+
+    def record_occupancy(self, ward_name, at, occupied_beds):
+        times, occupied = self.ward_occupancy.setdefault(ward_name, (array("d"), array("l")))
+        times.append(at.timestamp())
+        occupied.append(occupied_beds)
+
+    def summary(self, days=30, points=DASHBOARD_POINTS):
+        # JSON-friendly copy of what the dashboard draws: recent days and the latest occupancy points
+        recent = sorted(self.revenue_by_day)[-days:]
+        return {
+            "revenue_by_day": [[day.isoformat(), self.revenue_by_day[day]] for day in recent],
+            "revenue_by_specialization": dict(self.revenue_by_specialization),
+            "registration_total": self.registration_total,
+            "medicine_total": self.medicine_total,
+            "ward_occupancy": {ward: [times[-points:].tolist(), occupied[-points:].tolist()] for ward, (times, occupied) in self.ward_occupancy.items()},
+        }
+
+    def billing_arrays(self, hms):
+        # Full billing history as NumPy arrays; zero-copy views when billing is stored in columns
+        import numpy as np
+        store = hms.billing_store
+        if isinstance(store, ColumnStore):
+            return {field: np.frombuffer(column, dtype=np.float64 if kind == "T" else np.int64) for field, kind, column in zip(store.fields, store.kinds, store.columns) if kind}
+        records = store.records
+        return {
+            "patient_id": np.fromiter((record.patient_id for record in records), np.int64, len(records)),
+            "registration_charge": np.fromiter((record.registration_charge for record in records), np.int64, len(records)),
+            "medicine_cost": np.fromiter((record.medicine_cost for record in records), np.int64, len(records)),
+            "billed_at": np.fromiter((record.billed_at.timestamp() if record.billed_at else np.nan for record in records), np.float64, len(records)),
+        }
+
+    def query_revenue(self, hms, start=None, end=None):
+        # Totals for billing between two datetimes, computed with vectorised masks
+        import numpy as np
+        columns = self.billing_arrays(hms)
+        mask = np.ones(len(columns["patient_id"]), dtype=bool)
+        if start is not None:
+            mask &= columns["billed_at"] >= start.timestamp()
+        if end is not None:
+            mask &= columns["billed_at"] < end.timestamp()
+        registration = int(columns["registration_charge"][mask].sum())
+        medicine = int(columns["medicine_cost"][mask].sum())
+        return {"bills": int(mask.sum()), "registration": registration, "medicine": medicine, "total": registration + medicine}
+
+    def top_patients(self, hms, count=10):
+        # Highest-billed patients over the full history as (patient id, total) pairs
+        import numpy as np
+        columns = self.billing_arrays(hms)
+        if not len(columns["patient_id"]):
+            return []
+        totals = np.bincount(columns["patient_id"], weights=columns["registration_charge"] + columns["medicine_cost"])
+        count = min(count, len(totals))
+        top = np.argpartition(totals, -count)[-count:]
+        top = top[np.argsort(totals[top])[::-1]]
+        return [(int(patient_id), int(totals[patient_id])) for patient_id in top if totals[patient_id] > 0]
+
+class SQLiteBackend:
+    # Durable storage in one reused WAL-mode connection; writes are grouped into batched commits
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS patients (id INTEGER PRIMARY KEY, name TEXT, age INTEGER, gender TEXT, ailment TEXT, token INTEGER);
+        CREATE TABLE IF NOT EXISTS doctors (id INTEGER PRIMARY KEY, name TEXT, specialization TEXT, contact TEXT);
+        CREATE TABLE IF NOT EXISTS appointments (id INTEGER PRIMARY KEY, patient_id INTEGER, doctor_id INTEGER, appointment_time TEXT);
+        CREATE TABLE IF NOT EXISTS billing (id INTEGER PRIMARY KEY, patient_id INTEGER, registration_charge INTEGER, medicine_cost INTEGER, billed_at TEXT, doctor_id INTEGER);
+        CREATE TABLE IF NOT EXISTS feedbacks (id INTEGER PRIMARY KEY, text TEXT);
+        CREATE TABLE IF NOT EXISTS complaints (id INTEGER PRIMARY KEY, text TEXT);
+        CREATE TABLE IF NOT EXISTS wards (name TEXT PRIMARY KEY, total_beds INTEGER, occupied_beds INTEGER, ward_type TEXT);
+        CREATE TABLE IF NOT EXISTS beds (ward_name TEXT, bed INTEGER, patient_id INTEGER, PRIMARY KEY (ward_name, bed));
+        CREATE TABLE IF NOT EXISTS ward_occupancy (id INTEGER PRIMARY KEY, ward_name TEXT, at TEXT, occupied_beds INTEGER);
+        CREATE TABLE IF NOT EXISTS tokens (token INTEGER PRIMARY KEY, patient_id INTEGER, priority TEXT, department TEXT, issued_at TEXT, called_at TEXT);
+        CREATE TABLE IF NOT EXISTS reminders (appointment INTEGER PRIMARY KEY);
+        CREATE INDEX IF NOT EXISTS appointments_patient_id ON appointments (patient_id);
+        CREATE INDEX IF NOT EXISTS appointments_doctor_id ON appointments (doctor_id);
+        CREATE INDEX IF NOT EXISTS appointments_time ON appointments (appointment_time);
+        CREATE INDEX IF NOT EXISTS billing_patient_id ON billing (patient_id);
+        CREATE INDEX IF NOT EXISTS tokens_patient_id ON tokens (patient_id);
+        CREATE INDEX IF NOT EXISTS tokens_called_at ON tokens (called_at);
+    """
+    # Every bed change also appends to the occupancy history the dashboard draws
+    OCCUPANCY_STATEMENT = ("INSERT INTO ward_occupancy (ward_name, at, occupied_beds) VALUES (?, ?, ?)", ("ward_name", "at", "occupied_beds"))
+    # Op -> [(statement, record fields)]; statements are parameterised so sqlite3 reuses the prepared form
+    STATEMENTS = {
+        "add_patient": [("INSERT INTO patients (id, name, age, gender, ailment, token) VALUES (?, ?, ?, ?, ?, ?)", ("id", "name", "age", "gender", "ailment", "token"))],
+        "add_doctor": [("INSERT INTO doctors (id, name, specialization, contact) VALUES (?, ?, ?, ?)", ("id", "name", "specialization", "contact"))],
+        "schedule_appointment": [("INSERT INTO appointments (patient_id, doctor_id, appointment_time) VALUES (?, ?, ?)", ("patient_id", "doctor_id", "appointment_time"))],
+        "add_billing": [("INSERT INTO billing (patient_id, registration_charge, medicine_cost, billed_at, doctor_id) VALUES (?, ?, ?, ?, ?)", ("patient_id", "registration_charge", "medicine_cost", "billed_at", "doctor_id"))],
+        "add_feedback": [("INSERT INTO feedbacks (text) VALUES (?)", ("text",))],
+        "add_complaint": [("INSERT INTO complaints (text) VALUES (?)", ("text",))],
+        "add_ward": [("INSERT INTO wards (name, total_beds, occupied_beds, ward_type) VALUES (?, ?, ?, ?)", ("ward_name", "total_beds", "occupied_beds", "ward_type")), OCCUPANCY_STATEMENT],
+        "assign_bed": [("UPDATE wards SET occupied_beds = ? WHERE name = ?", ("occupied_beds", "ward_name")), ("INSERT INTO beds (ward_name, bed, patient_id) VALUES (?, ?, ?)", ("ward_name", "bed", "patient_id")), OCCUPANCY_STATEMENT],
+        "discharge": [("UPDATE wards SET occupied_beds = ? WHERE name = ?", ("occupied_beds", "ward_name")), ("DELETE FROM beds WHERE ward_name = ? AND bed = ?", ("ward_name", "bed")), OCCUPANCY_STATEMENT],
+        "issue_token": [("INSERT INTO tokens (token, patient_id, priority, department, issued_at) VALUES (?, ?, ?, ?, ?)", ("token", "patient_id", "priority", "department", "issued_at"))],
+        "call_token": [("UPDATE tokens SET called_at = ? WHERE token = ?", ("called_at", "token"))],
+        "send_reminder": [("INSERT OR IGNORE INTO reminders (appointment) VALUES (?)", ("appointment",))],  # Position of the appointment in id order
+    }
+
+    def __init__(self, path=DB_PATH, batch_size=500, commit_interval=1.0):
+        import sqlite3
+        sqlite3.register_adapter(datetime, self._encode)  # Times are stored as "YYYY-MM-DD HH:MM:SS" text
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe; only the last batch can be lost on power failure
+        self.connection.executescript(self.SCHEMA)
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.pending = 0
+        self.last_commit = time.monotonic()
+
+    def persist(self, op, record):
+        if not self.pending:
+            self.connection.execute("BEGIN")
+        for statement, fields in self.STATEMENTS[op]:
+            self.connection.execute(statement, [record[field] for field in fields])
+        self.pending += 1
+        if self.pending >= self.batch_size or time.monotonic() - self.last_commit >= self.commit_interval:
+            self.flush()
+
+    def persist_batch(self, writes):
+        # Consecutive writes of the same kind go through executemany in a single transaction
+        if not self.pending:
+            self.connection.execute("BEGIN")
+        for op, group in itertools.groupby(writes, key=lambda write: write[0]):
+            records = [record for _, record in group]
+            for statement, fields in self.STATEMENTS[op]:
+                self.connection.executemany(statement, map(self._values(fields, records[0]), records))
+        self.pending += len(writes)
+        self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.connection.execute("COMMIT")
+            self.pending = 0
+        self.last_commit = time.monotonic()
+
+    checkpoint = flush  # Nothing to snapshot: the database is its own
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def load(self, hms):
+        # Warm the in-memory write-through cache; history is aggregated in SQL rather than loaded
+        execute = self.connection.execute
+        for row in execute("SELECT id, name, age, gender, ailment, token FROM patients ORDER BY id"):
+            hms.restore("add_patient", Patient(*row))
+        for row in execute("SELECT id, name, specialization, contact FROM doctors ORDER BY id"):
+            hms.restore("add_doctor", Doctor(*row))
+        for patient_id, doctor_id, appointment_time in execute("SELECT patient_id, doctor_id, appointment_time FROM appointments ORDER BY id"):
+            hms.restore("schedule_appointment", Appointment(patient_id, doctor_id, datetime.fromisoformat(appointment_time)))
+        for (position,) in execute("SELECT appointment FROM reminders"):
+            hms.restore("send_reminder", {"appointment": position})
+        for patient_id, registration_charge, medicine_cost, billed_at, doctor_id in execute("SELECT patient_id, registration_charge, medicine_cost, billed_at, doctor_id FROM billing ORDER BY id"):
+            hms.restore("add_billing", BillingRecord(patient_id, registration_charge, medicine_cost, datetime.fromisoformat(billed_at), doctor_id))
+        for (text,) in execute("SELECT text FROM feedbacks ORDER BY id"):
+            hms.restore("add_feedback", {"text": text})
+        for (text,) in execute("SELECT text FROM complaints ORDER BY id"):
+            hms.restore("add_complaint", {"text": text})
+        for name, total_beds, ward_type in execute("SELECT name, total_beds, ward_type FROM wards"):
+            hms.restore("add_ward", {"ward_name": name, "total_beds": total_beds, "ward_type": ward_type})
+        for ward_name, bed, patient_id in execute("SELECT ward_name, bed, patient_id FROM beds ORDER BY ward_name, bed"):
+            hms.restore("assign_bed", {"ward_name": ward_name, "bed": bed, "patient_id": patient_id})
+        for ward_name, at, occupied_beds in execute("SELECT ward_name, at, occupied_beds FROM ward_occupancy ORDER BY id"):
+            hms.analytics.record_occupancy(ward_name, datetime.fromisoformat(at), occupied_beds)
+        for token, patient_id, priority, department, issued_at in execute("SELECT token, patient_id, priority, department, issued_at FROM tokens WHERE called_at IS NULL ORDER BY token"):
+            hms.restore("issue_token", Token(token, patient_id, priority, department, datetime.fromisoformat(issued_at)))
+        last_hour = datetime.now() - timedelta(hours=1)
+        for department, served, total_wait, last_token in execute("SELECT department, COUNT(*), SUM((julianday(called_at) - julianday(issued_at)) * 86400), MAX(token) FROM tokens WHERE called_at IS NOT NULL GROUP BY department").fetchall():
+            served_times = [datetime.fromisoformat(called_at) for (called_at,) in execute("SELECT called_at FROM tokens WHERE department = ? AND called_at > ? ORDER BY called_at", (department, last_hour))]
+            hms.token_queue.restore_stats(department, served, total_wait, served_times, last_token)
+
+    @staticmethod
+    def _values(fields, record):
+        # Function returning a record's values for fields as a tuple, read in C: attributes of Record
+        # instances, keys of the dicts other writes carry
+        get = operator.attrgetter(*fields) if isinstance(record, Record) else operator.itemgetter(*fields)
+        return get if len(fields) > 1 else lambda record: (get(record),)
+
+    @staticmethod
+    def _encode(moment):
+        return moment.isoformat(sep=" ")
+
+class StorageInUseError(Exception):
+    pass
+
+class JournalBackend:
+    # Append-only, length-prefixed journal segments plus periodic snapshots; startup loads the
+    # newest snapshot and replays only the journal written after it. Both hold plain tuples, lists
+    # and dicts, never classes of this module, so they load however the code is run or imported.
+    HEADER = struct.Struct("<I")
+    # Op -> the record class whose values its journal entries carry; other ops carry plain dicts
+    RECORD_KINDS = {"add_patient": Patient, "add_doctor": Doctor, "schedule_appointment": Appointment, "add_billing": BillingRecord, "issue_token": Token, "call_token": Token}
+
+    def __init__(self, directory=DATA_DIR, batch_size=500, commit_interval=1.0, snapshot_every=100000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.lock_file = self._lock(directory)
+        for stale in glob.glob(os.path.join(directory, "snapshot-*.tmp")):  # Left by a snapshot cut short by a crash
+            os.remove(stale)
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.snapshot_every = snapshot_every  # Journal records between snapshots
+        self.buffer = bytearray()
+        self.pending = 0
+        self.since_snapshot = 0
+        self.last_commit = time.monotonic()
+        self.hms = None
+        self.segment = None
+        self.load_seconds = None
+        self.snapshotting = None  # Thread writing a background snapshot, while one is being written
+
+    def persist(self, op, record):
+        payload = pickle.dumps((op, record._values(record) if op in self.RECORD_KINDS else record), pickle.HIGHEST_PROTOCOL)
+        self.buffer += self.HEADER.pack(len(payload))
+        self.buffer += payload
+        self.pending += 1
+        self.since_snapshot += 1
+        if self.pending >= self.batch_size or time.monotonic() - self.last_commit >= self.commit_interval:
+            self.flush()
+
+    def persist_batch(self, writes):
+        # A whole import batch becomes one journal record, with runs of one op stored as (op, records)
+        groups = []
+        for op, group in itertools.groupby(writes, key=operator.itemgetter(0)):
+            records = [record for _, record in group]
+            groups.append((op, list(map(self.RECORD_KINDS[op]._values, records)) if op in self.RECORD_KINDS else records))
+        payload = pickle.dumps(("batch", groups), pickle.HIGHEST_PROTOCOL)
+        self.buffer += self.HEADER.pack(len(payload))
+        self.buffer += payload
+        self.pending += 1
+        self.since_snapshot += len(writes)
+        self.flush()
+
+    def flush(self):
+        # Group commit: one write and one fsync per batch
+        if self.pending:
+            self.segment.write(self.buffer)
+            self.segment.flush()
+            os.fsync(self.segment.fileno())
+            self.buffer.clear()
+            self.pending = 0
+        self.last_commit = time.monotonic()
+
+    def checkpoint(self):
+        # Periodic upkeep, never on the write path: commit the open batch and start a snapshot once
+        # snapshot_every records have been journaled since the last one
+        self.flush()
+        if self.since_snapshot >= self.snapshot_every and self.snapshotting is None:
+            self.snapshot(background=True)
+
+    def close(self):
+        self.flush()
+        snapshotting = self.snapshotting  # Read once: the thread clears the attribute when it finishes
+        if snapshotting is not None:
+            snapshotting.join()
+        if self.since_snapshot:
+            self.snapshot()
+        self.segment.close()
+        self.lock_file.close()  # Releases the directory lock
+
+    def snapshot(self, background=False):
+        # Start a new segment, then write the state as of that cut as the snapshot and drop the older files.
+        # The caller holds the write lock only while snapshot_state() copies the cut; encoding and pickling
+        # it run on a background thread, or inline on close.
+        self.flush()
+        sequence = self.sequence + 1
+        self._open_segment(sequence)
+        self.since_snapshot = 0
+        encode = self.hms.snapshot_state()
+        if not background:
+            self._write_snapshot(sequence, encode)
+            return
+        self.snapshotting = threading.Thread(target=self._write_in_background, args=(sequence, encode), daemon=True)
+        self.snapshotting.start()
+
+    def _write_snapshot(self, sequence, encode):
+        # Until the snapshot is complete the older snapshot and segments stay, and a restart replays them all
+        path = self._path("snapshot", sequence)
+        with open(path + ".tmp", "wb") as snapshot:
+            pickle.dump(encode(), snapshot, pickle.HIGHEST_PROTOCOL)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(path + ".tmp", path)
+        self._drop_before(sequence)
+
+    def _write_in_background(self, sequence, encode):
+        try:
+            self._write_snapshot(sequence, encode)
+        except Exception as error:
+            print(f"Could not write snapshot {sequence}: {error}", file=sys.stderr)
+        finally:
+            self.snapshotting = None
+
+    def _drop_before(self, sequence):
+        for old in self._files("snapshot") + self._files("journal"):
+            if old[0] < sequence:
+                os.remove(old[1])
+
+    def load(self, hms):
+        started = time.perf_counter()
+        self.hms = hms
+        snapshots = self._files("snapshot")
+        sequence = snapshots[-1][0] if snapshots else 0
+        if snapshots:
+            with open(snapshots[-1][1], "rb") as snapshot:
+                hms.load_snapshot(pickle.load(snapshot))
+        for segment_sequence, path in self._files("journal"):
+            if segment_sequence >= sequence:
+                self.since_snapshot += self._replay(path, hms)
+        self._open_segment(max([sequence] + [segment_sequence for segment_sequence, _ in self._files("journal")]))
+        self.load_seconds = time.perf_counter() - started
+
+    def _replay(self, path, hms):
+        with open(path, "rb") as segment:
+            data = segment.read()
+        view = memoryview(data)
+        offset = replayed = 0
+        while offset + self.HEADER.size <= len(data):
+            (length,) = self.HEADER.unpack_from(data, offset)
+            end = offset + self.HEADER.size + length
+            if end > len(data):
+                break  # Torn write from a crash; everything before it is intact
+            op, record = pickle.loads(view[offset + self.HEADER.size:end])
+            if op == "batch":
+                for batch_op, records in record:
+                    kind = self.RECORD_KINDS.get(batch_op)
+                    for batch_record in (itertools.starmap(kind, records) if kind is not None else records):
+                        hms.restore(batch_op, batch_record)
+                    replayed += len(records)
+            else:
+                kind = self.RECORD_KINDS.get(op)
+                hms.restore(op, kind(*record) if kind is not None else record)
+                replayed += 1
+            offset = end
+        if offset < len(data):
+            with open(path, "r+b") as segment:
+                segment.truncate(offset)
+        return replayed
+
+    @staticmethod
+    def _lock(directory):
+        # Two processes appending to one journal would interleave and lose writes, so the directory
+        # is locked for as long as the backend is open
+        lock_file = open(os.path.join(directory, "LOCK"), "a")
+        try:
+            import fcntl
+        except ImportError:  # Windows has no flock; there, keep to one process per directory
+            return lock_file
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise StorageInUseError(f"{directory} is already open in another process; close it there first") from None
+        return lock_file
+
+    def _open_segment(self, sequence):
+        if self.segment is not None:
+            self.segment.close()
+        self.sequence = sequence
+        self.segment = open(self._path("journal", sequence), "ab")
+
+    def _path(self, kind, sequence):
+        return os.path.join(self.directory, f"{kind}-{sequence:08d}.{'bin' if kind == 'snapshot' else 'log'}")
+
+    def _files(self, kind):
+        paths = glob.glob(os.path.join(self.directory, f"{kind}-*.{'bin' if kind == 'snapshot' else 'log'}"))
+        return sorted((int(os.path.basename(path).split("-")[1].split(".")[0]), path) for path in paths)
+
+def make_backend(storage=STORAGE, path=None):
+    if storage == "sqlite":
+        return SQLiteBackend(path or DB_PATH)
+    return JournalBackend(path or DATA_DIR)
+
+@contextmanager
+def collection_paused():
+    # Loads and imports allocate many long-lived objects at once, which the cyclic collector would rescan
+    # over and over; pause it for the duration (restoring whatever state it was in)
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+class HospitalManagementSystem:
+    # State captured by snapshots; the reminder heap is rebuilt from appointments and the reminded positions instead
+    def __init__(self, backend=None, columnar=False):
+        # In-memory data structures, indexed by primary key and by owning patient/doctor.
+        # columnar=True keeps appointments and billing in typed arrays instead of record objects.
+        self.lock = RWLock()  # Getters share it, mutations take it exclusively
+        self.patient_ids = IdAllocator()
+        self.doctor_ids = IdAllocator()
+        self.patient_store = EntityStore(key="id", indexes=("age",), folded=("ailment",))
+        self.doctor_store = EntityStore(key="id", folded=("specialization",))
+        if columnar:
+            self.appointment_store = ColumnStore(Appointment, (("patient_id", "q"), ("doctor_id", "q"), ("appointment_time", "T")), indexes=("patient_id", "doctor_id"))
+            self.billing_store = ColumnStore(BillingRecord, (("patient_id", "q"), ("registration_charge", "q"), ("medicine_cost", "q"), ("billed_at", "T"), ("doctor_id", None)), indexes=("patient_id",))
+        else:
+            self.appointment_store = EntityStore(indexes=("patient_id", "doctor_id"))
+            self.billing_store = EntityStore(indexes=("patient_id",))
+        self.patients = self.patient_store.records
+        self.doctors = self.doctor_store.records
+        self.appointments = self.appointment_store.records
+        self.billing_records = self.billing_store.records
+        self.feedbacks = []
+        self.complaints = []
+        # Search indexes, updated on every add
+        self.patient_names = PrefixIndex("name")
+        self.doctor_names = PrefixIndex("name")
+        self.feedback_index = TextIndex()
+        self.complaint_index = TextIndex()
+        self.token_queue = TokenQueue()  # Triage-aware token queues per department
+        self.wards = {}  # Ward name -> Ward
+        self.admissions = {}  # Patient id -> (ward name, bed)
+        self.bed_availability = BedAvailability()
+        self.analytics = Analytics()
+        self.booking = BookingEngine()
+        self.reminders = ReminderScheduler()
+        self.notifications = deque()  # Non-modal queue drained by the UI
+        self.reminder_sink = self.notifications.append  # Replace to route reminders elsewhere
+        self.backend = backend  # Optional persistence; in-memory state acts as its write-through cache
+        self.pending_writes = None  # Set while bulk() collects writes for one batched persist
+        if backend is not None:
+            with collection_paused():
+                backend.load(self)
+                self.tidy_name_indexes()
+            gc.freeze()  # Keep what was loaded out of later full collections
+
+    @write_locked
+    def add_patient(self, name, age, gender, ailment, priority="Normal", department="General OPD", issue_token=True):
+        patient_id = self.patient_ids.next()
+        token_number = None
+        if issue_token:
+            token_number = self.token_queue.issue(patient_id, priority, department)  # Generate token and add it to the queue
+        patient = self.patient_store.add(Patient(patient_id, name, age, gender, ailment, token_number))
+        self.patient_names.add(patient)
+        self._persist("add_patient", patient)
+        if issue_token:
+            self._persist("issue_token", self.token_queue.waiting[token_number])
+        return patient_id
+
+    @write_locked
+    def add_doctor(self, name, specialization, contact):
+        doctor_id = self.doctor_ids.next()
+        doctor = self.doctor_store.add(Doctor(doctor_id, name, specialization, contact))
+        self.doctor_names.add(doctor)
+        self.booking.add_doctor(doctor)
+        self._persist("add_doctor", doctor)
+        return doctor_id
+
+    @write_locked
+    def schedule_appointment(self, patient_id, doctor_id, appointment_time):
+        # Raises BookingError for unknown patients/doctors, times outside working hours and double bookings
+        # The key indexes are read directly: the write lock is already held, and imports call this per row
+        if patient_id not in self.patient_store.by_key:
+            raise BookingError(f"No patient with ID {patient_id}.")
+        if doctor_id not in self.doctor_store.by_key:
+            raise BookingError(f"No doctor with ID {doctor_id}.")
+        start = self.booking.check(patient_id, doctor_id, appointment_time)
+        appointment = self.appointment_store.add(Appointment(patient_id, doctor_id, appointment_time))
+        self.booking.book(appointment, start)
+        self.reminders.add(appointment, len(self.appointment_store) - 1)
+        self._persist("schedule_appointment", appointment)
+
+    @read_locked
+    def find_free_slots(self, specialization, after=None, count=5):
+        # Returns [(slot start, doctor record)] for the next free slots of any doctor with that specialization
+        return [(moment, self.get_doctor(doctor_id)) for moment, doctor_id in self.booking.find_free_slots(specialization, after or datetime.now(), count)]
+
+    @write_locked
     def add_feedback(self, feedback):
         self.feedbacks.append(feedback)
+        self.feedback_index.add(feedback)
+        self._persist("add_feedback", {"text": feedback})
 
+    @write_locked
     def add_complaint(self, complaint):
         self.complaints.append(complaint)
+        self.complaint_index.add(complaint)
+        self._persist("add_complaint", {"text": complaint})
 
-    def add_billing(self, patient_id, registration_charge, medicine_cost):
-        total_cost = registration_charge + medicine_cost
-        self.billing_records.append({"patient_id": patient_id, "registration_charge": registration_charge, "medicine_cost": medicine_cost, "total_cost": total_cost})
+    @write_locked
+    def add_billing(self, patient_id, registration_charge, medicine_cost, billed_at=None):
+        doctor = self.current_doctor_for(patient_id)
+        self._persist("add_billing", self.billing_store.add(BillingRecord(patient_id, registration_charge, medicine_cost, billed_at or datetime.now(), doctor.id if doctor else None)))
 
+    @read_locked
     def get_patients(self):
         return self.patients
 
+    @read_locked
+    def search_patients(self, prefix="", ailment=None, min_age=None, max_age=None, limit=SEARCH_LIMIT):
+        # Patients matching every given filter. Candidates come from whichever index narrows the most:
+        # the name index (then results are in name order), the ailment index or the age index.
+        low = 0 if min_age is None else min_age
+        high = sys.maxsize if max_age is None else max_age
+        sources = []
+        if prefix:
+            sources.append((self.patient_names.count(prefix), lambda: self.patient_names.search(prefix)))
+        if ailment:
+            sources.append((self.patient_store.count_folded("ailment", ailment), lambda: self.patient_store.lookup_folded("ailment", ailment)))
+        if min_age is not None or max_age is not None:
+            sources.append((self.patient_store.count_range("age", low, high), lambda: self.patient_store.lookup_range("age", low, high)))
+        if not sources:
+            return self.patients[:limit]
+        prefix, ailment = prefix.casefold(), (ailment or "").casefold()
+        matches = (patient for patient in min(sources, key=lambda source: source[0])[1]()
+                   if patient.name.casefold().startswith(prefix) and (not ailment or patient.ailment.casefold() == ailment) and low <= patient.age <= high)
+        return list(itertools.islice(matches, limit))
+
+    @read_locked
+    def search_doctors(self, prefix="", specialization=None, limit=SEARCH_LIMIT):
+        if specialization:
+            prefix = prefix.casefold()
+            return list(itertools.islice((doctor for doctor in self.doctor_store.lookup_folded("specialization", specialization) if doctor.name.casefold().startswith(prefix)), limit))
+        return list(itertools.islice(self.doctor_names.search(prefix), limit)) if prefix else self.doctors[:limit]
+
+    @read_locked
+    def search_feedback(self, query, limit=SEARCH_LIMIT):
+        return [self.feedbacks[document] for document in self.feedback_index.search(query, limit)]
+
+    @read_locked
+    def search_complaints(self, query, limit=SEARCH_LIMIT):
+        return [self.complaints[document] for document in self.complaint_index.search(query, limit)]
+
+    @read_locked
+    def get_patient(self, patient_id):
+        return self.patient_store.get(patient_id)
+
+    @read_locked
     def get_doctors(self):
         return self.doctors
 
+    @read_locked
+    def get_doctor(self, doctor_id):
+        return self.doctor_store.get(doctor_id)
+
+    @read_locked
     def get_appointments(self):
         return self.appointments
 
-    def add_ward(self, ward_name, total_beds):
-        if ward_name not in self.wards:
-            self.wards[ward_name] = {"total_beds": total_beds, "occupied_beds": 0}
-            return True
-        return False
+    @read_locked
+    def appointments_for_patient(self, patient_id):
+        return self.appointment_store.lookup("patient_id", patient_id)
+
+    @read_locked
+    def appointments_for_doctor(self, doctor_id):
+        return self.appointment_store.lookup("doctor_id", doctor_id)
 
-    def assign_bed(self, ward_name):
-        if ward_name in self.wards and self.wards[ward_name]["occupied_beds"] < self.wards[ward_name]["total_beds"]:
-            self.wards[ward_name]["occupied_beds"] += 1
+    @read_locked
+    def billing_for(self, patient_id):
+        return self.billing_store.lookup("patient_id", patient_id)
+
+    @read_locked
+    def current_doctor_for(self, patient_id):
+        # Doctor of the patient's most recently booked appointment
+        appointments = self.appointments_for_patient(patient_id)
+        if appointments:
+            return self.get_doctor(appointments[-1]["doctor_id"])
+        return None
+
+    @write_locked
+    def add_ward(self, ward_name, total_beds, ward_type="General"):
+        if ward_name not in self.wards:
+            ward = self.wards[ward_name] = Ward(ward_name, total_beds, ward_type)
+            self.bed_availability.update(ward, self.wards)
+            self._persist("add_ward", {"ward_name": ward_name, "total_beds": total_beds, "ward_type": ward_type, "occupied_beds": 0, "at": datetime.now()})
             return True
         return False
 
+    @write_locked
+    def assign_bed(self, ward_name, patient_id):
+        # Gives the patient the lowest free bed in the ward; returns the bed number, or False when the ward is
+        # full or unknown, the patient is unknown or the patient already has a bed
+        ward = self.wards.get(ward_name)
+        if ward is None or not ward.free_beds or patient_id in self.admissions or self.get_patient(patient_id) is None:
+            return False
+        bed = ward.occupy(patient_id)
+        self.admissions[patient_id] = (ward_name, bed)
+        self.bed_availability.update(ward, self.wards)
+        self._persist("assign_bed", {"ward_name": ward_name, "bed": bed, "patient_id": patient_id, "occupied_beds": ward.occupied_beds, "at": datetime.now()})
+        return bed
+
+    @read_locked
+    def find_ward(self, ward_type=None):
+        # Where a patient can be admitted right now: the ward (of that type) with the most free beds
+        return self.bed_availability.best(self.wards, ward_type)
+
+    @write_locked
+    def admit(self, patient_id, ward_name=None, ward_type=None):
+        # Returns (ward name, bed) or None when no bed is free or the patient is unknown or already admitted
+        if self.get_patient(patient_id) is None:
+            return None
+        if ward_name is None:
+            ward = self.find_ward(ward_type)
+            if ward is None:
+                return None
+            ward_name = ward.name
+        bed = self.assign_bed(ward_name, patient_id)
+        return (ward_name, bed) if bed is not False else None
+
+    @write_locked
+    def discharge(self, patient_id):
+        admission = self.admissions.pop(patient_id, None)
+        if admission is None:
+            return False
+        ward_name, bed = admission
+        ward = self.wards[ward_name]
+        ward.release(bed)
+        self.bed_availability.update(ward, self.wards)
+        self._persist("discharge", {"ward_name": ward_name, "bed": bed, "patient_id": patient_id, "occupied_beds": ward.occupied_beds, "at": datetime.now()})
+        return True
+
+    @write_locked
+    def transfer(self, patient_id, ward_name):
+        # Moves an admitted patient only if the target ward has a free bed; returns the new bed or None
+        ward = self.wards.get(ward_name)
+        if patient_id not in self.admissions or ward is None or not ward.free_beds or self.admissions[patient_id][0] == ward_name:
+            return None
+        self.discharge(patient_id)
+        return self.assign_bed(ward_name, patient_id)
+
+    @read_locked
+    def get_admission(self, patient_id):
+        return self.admissions.get(patient_id)
+
+    @read_locked
     def get_wards(self):
         return self.wards
 
-    def get_next_token(self):
-        if self.token_queue:
-            return self.token_queue.pop(0)  # Return and remove the next token
+    def reading(self):
+        # Hold for several reads that must see one consistent state, e.g. a report or an export
+        return self.lock.reading()
+
+    @write_locked
+    def get_next_token(self, department=None):
+        entry = self.token_queue.call_next(department)  # Return and remove the next token
+        if entry:
+            self._persist("call_token", entry)
+            return entry["token"]
         return None
 
-    def send_reminder(self):
+    @read_locked
+    def get_waiting_tokens(self, start=0, stop=None):
+        return list(itertools.islice(self.token_queue.waiting.values(), start, stop))
+
+    @write_locked
+    def get_token_stats(self, department=None):
+        # Exclusive because computing the stats prunes the last-hour window
+        return self.token_queue.stats(department)
+
+    def set_reminder_sink(self, sink):
+        self.reminder_sink = sink
+
+    @write_locked
+    def send_reminder(self, now=None):
+        sent = 0
+        for position, appointment in self.reminders.pop_due(now or datetime.now()):  # Reminder for appointments within the next day
+            patient = self.get_patient(appointment["patient_id"])
+            if patient:
+                self.reminder_sink(f"Reminder: {patient['name']}, you have an appointment scheduled on {appointment['appointment_time'].strftime('%Y-%m-%d %H:%M')}.")
+                sent += 1
+            self._persist("send_reminder", {"appointment": position})  # So a restart does not remind again
+        return sent
+
+    @read_locked
+    def next_reminder_due(self):
+        return self.reminders.next_due()
+
+    @read_locked
+    def get_dashboard(self):
+        return self.analytics.summary()
+
+    @read_locked
+    def query_revenue(self, start=None, end=None):
+        return self.analytics.query_revenue(self, start, end)
+
+    @read_locked
+    def top_patients(self, count=10):
+        return self.analytics.top_patients(self, count)
+
+    @write_locked
+    def bulk(self, method, rows, tidy=True):
+        # Call an add_* method once per argument tuple and persist all resulting writes as one batch.
+        # Returns (position, reason) for rows the method rejected; reason is None when it returned False.
+        # The write lock is held throughout, so rows go straight to the method, past its lock and timing wrappers.
+        # Callers sending many batches pass tidy=False and call tidy_name_indexes() after the last one.
+        add = getattr(type(self), method)
+        while hasattr(add, "__wrapped__"):
+            add = add.__wrapped__
+        add = add.__get__(self)
+        rejected = []
+        self.pending_writes = []
+        # Pickling the batch allocates a tuple per datetime, so the collector stays paused through persisting too
+        with collection_paused():
+            try:
+                for position, args in enumerate(rows):
+                    try:
+                        if add(*args) is False:
+                            rejected.append((position, None))
+                    except BookingError as error:
+                        rejected.append((position, str(error)))
+            finally:
+                writes, self.pending_writes = self.pending_writes, None
+                if writes and self.backend is not None:
+                    self.backend.persist_batch(writes)
+                if tidy:
+                    self.tidy_name_indexes()
+        return rejected
+
+    def _persist(self, op, record):
+        self.analytics.observe(op, record, self)
+        if self.pending_writes is not None:
+            self.pending_writes.append((op, record))
+        elif self.backend is not None:
+            self.backend.persist(op, record)
+
+    @write_locked
+    def flush(self):
+        # The service calls this periodically; besides committing, that is when a due snapshot starts
+        if self.backend is not None:
+            self.backend.checkpoint()
+
+    @write_locked
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+
+    def restore(self, op, record):
+        # Re-apply a persisted mutation to the in-memory state without persisting it again
+        if op == "add_patient":
+            self.patient_ids.observe(record["id"])
+            self.patient_names.add(self.patient_store.add(record))
+        elif op == "add_doctor":
+            self.doctor_ids.observe(record["id"])
+            self.doctor_names.add(self.doctor_store.add(record))
+            self.booking.add_doctor(record)
+        elif op == "schedule_appointment":
+            appointment = self.appointment_store.add(record)
+            self.booking.book(appointment)
+            self.reminders.add(appointment, len(self.appointment_store) - 1)
+        elif op == "add_billing":
+            self.billing_store.add(record)
+        elif op == "add_feedback":
+            self.feedbacks.append(record["text"])
+            self.feedback_index.add(record["text"])
+        elif op == "add_complaint":
+            self.complaints.append(record["text"])
+            self.complaint_index.add(record["text"])
+        elif op == "add_ward":
+            ward = self.wards[record["ward_name"]] = Ward(record["ward_name"], record["total_beds"], record["ward_type"])
+            self.bed_availability.update(ward, self.wards)
+        elif op == "assign_bed":
+            ward = self.wards[record["ward_name"]]
+            self.admissions[record["patient_id"]] = (ward.name, ward.occupy(record["patient_id"], record["bed"]))
+            self.bed_availability.update(ward, self.wards)
+        elif op == "discharge":
+            ward = self.wards[record["ward_name"]]
+            ward.release(record["bed"])
+            self.admissions.pop(record["patient_id"], None)
+            self.bed_availability.update(ward, self.wards)
+        elif op == "issue_token":
+            self.token_queue.restore(record)
+        elif op == "call_token":
+            self.token_queue.restore_call(record)
+        elif op == "send_reminder":
+            self.reminders.sent.add(record["appointment"])
+        self.analytics.observe(op, record, self)
+
+    def tidy_name_indexes(self):
+        # Sort pending names now (after loads and bulk imports) so the first search does not have to
+        self.patient_names.tidy()
+        self.doctor_names.tidy()
+
+    def snapshot_state(self):
+        # Called under the write lock, so it only copies; the function it returns builds the snapshot later,
+        # off the lock, as plain values. Stores and text lists only ever append records that never change, so
+        # their cut is just a length; what changes in place (name order, queues, beds, aggregates) is copied.
+        self.tidy_name_indexes()
+        patients, doctors, appointments, billing = len(self.patients), len(self.doctors), len(self.appointments), len(self.billing_records)
+        feedbacks, complaints = len(self.feedbacks), len(self.complaints)
+        patient_names, doctor_names = self.patient_names.ordered(), self.doctor_names.ordered()
+        waiting = list(self.token_queue.waiting.values())
+        state = {
+            "patient_ids": self.patient_ids.last,
+            "doctor_ids": self.doctor_ids.last,
+            "token_ids": self.token_queue.tokens.last,
+            "token_counters": self.token_queue.counters(),
+            "wards": [(ward.name, ward.total_beds, ward.ward_type, list(ward.free_beds), dict(ward.occupants)) for ward in self.wards.values()],
+            "admissions": dict(self.admissions),
+            "analytics": self.analytics.state(),
+            "reminded": list(self.reminders.sent),
+        }
+
+        def encode():
+            ids = operator.attrgetter("id")
+            state.update(
+                patients=list(map(Patient._values, self.patients[:patients])),
+                doctors=list(map(Doctor._values, self.doctors[:doctors])),
+                appointments=list(map(Appointment._values, self.appointments[:appointments])),
+                billing=list(map(BillingRecord._values, self.billing_records[:billing])),
+                feedbacks=self.feedbacks[:feedbacks],
+                complaints=self.complaints[:complaints],
+                patient_names=[list(map(ids, names)) for names in patient_names],
+                doctor_names=[list(map(ids, names)) for names in doctor_names],
+                waiting_tokens=[Token._values(token)[:-1] for token in waiting],  # Without called_at, which a call since the cut may have set
+            )
+            return state
+        return encode
+
+    def load_snapshot(self, state):
+        # Rebuild every store and index from what encode() in snapshot_state() saved
+        self.patient_ids.observe(state["patient_ids"])
+        self.doctor_ids.observe(state["doctor_ids"])
+        self.patient_store.extend(list(itertools.starmap(Patient, state["patients"])))
+        self.doctor_store.extend(list(itertools.starmap(Doctor, state["doctors"])))
+        for doctor in self.doctors:
+            self.booking.add_doctor(doctor)
+        self.appointment_store.extend(list(itertools.starmap(Appointment, state["appointments"])))
         for appointment in self.appointments:
-            appointment_time = appointment["appointment_time"]
-            if appointment_time <= datetime.now() + timedelta(days=1):  # Reminder for appointments within the next day
-                patient = next((p for p in self.patients if p["id"] == appointment["patient_id"]), None)
-                if patient:
-                    messagebox.showinfo("Appointment Reminder", f"Reminder: {patient['name']}, you have an appointment scheduled on {appointment_time.strftime('%Y-%m-%d %H:%M')}.")
+            self.booking.book(appointment)
+        self.billing_store.extend(list(itertools.starmap(BillingRecord, state["billing"])))
+        for texts, index, saved in ((self.feedbacks, self.feedback_index, state["feedbacks"]), (self.complaints, self.complaint_index, state["complaints"])):
+            texts.extend(saved)
+            for text in saved:
+                index.add(text)
+        for names, store, (main, recent) in ((self.patient_names, self.patient_store, state["patient_names"]), (self.doctor_names, self.doctor_store, state["doctor_names"])):
+            names.restore(list(map(store.by_key.__getitem__, main)), list(map(store.by_key.__getitem__, recent)))
+        self.token_queue.tokens.observe(state["token_ids"])
+        self.token_queue.restore_waiting(list(itertools.starmap(Token, state["waiting_tokens"])))
+        for department, (served, total_wait, served_times) in state["token_counters"].items():
+            self.token_queue.restore_stats(department, served, total_wait, served_times)
+        for values in state["wards"]:
+            ward = self.wards[values[0]] = Ward(*values)
+            self.bed_availability.update(ward, self.wards)
+        self.admissions.update(state["admissions"])
+        self.analytics.load_state(state["analytics"])
+        self.reminders.rebuild(self.appointments, datetime.now(), state["reminded"])
+
+# Every core call is timed, except the ones that only run while loading or that hand out a context manager
+instrument(HospitalManagementSystem, "hms", skip=("reading", "restore", "load_snapshot", "snapshot_state", "tidy_name_indexes", "set_reminder_sink"))
+
+class ServiceError(Exception):
+    # A request the service answered with an error status; the message comes from the service
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# HospitalManagementSystem methods callable as POST /api/<method> with keyword arguments as a JSON object
+SERVICE_METHODS = (
+    "add_patient", "add_doctor", "schedule_appointment", "find_free_slots", "add_feedback", "add_complaint", "add_billing",
+    "get_patients", "get_patient", "get_doctors", "get_doctor", "get_appointments", "appointments_for_patient", "appointments_for_doctor", "billing_for",
+    "search_patients", "search_doctors", "search_feedback", "search_complaints",
+    "add_ward", "assign_bed", "find_ward", "admit", "discharge", "transfer", "get_admission", "get_wards",
+    "get_next_token", "get_waiting_tokens", "get_token_stats", "send_reminder", "get_dashboard", "query_revenue", "top_patients",
+)
+# Calls a client may retry after a dropped connection, since repeating them changes nothing
+SERVICE_READ_ONLY = frozenset([name for name in SERVICE_METHODS if getattr(getattr(HospitalManagementSystem, name), "read_only", False)] + ["page", "notifications", "metrics"])
+SERVICE_TIME_ARGUMENTS = ("appointment_time", "billed_at", "after", "now", "start", "end")  # Sent as "YYYY-MM-DD HH:MM[:SS]"
+
+# Entity -> rows served a window at a time by the "page" call, for list views
+SERVICE_PAGES = {
+    "patients": lambda hms: hms.get_patients(),
+    "patients_by_name": lambda hms: hms.patient_names,
+    "doctors": lambda hms: hms.get_doctors(),
+    "appointments": lambda hms: hms.get_appointments(),
+    "billing": lambda hms: hms.billing_records,
+    "feedback": lambda hms: hms.feedbacks,
+    "complaints": lambda hms: hms.complaints,
+    "tokens": lambda hms: hms.token_queue.waiting.values(),
+    "wards": lambda hms: hms.get_wards().values(),
+}
+
+def service_json(value):
+    # json.dumps fallback for service payloads: records as field dicts, times as ISO strings
+    if isinstance(value, Ward):
+        return value.summary()
+    if isinstance(value, Record):
+        return value.as_dict()
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    if hasattr(value, "__iter__"):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class HMSService:
+    # Serves one HospitalManagementSystem as HTTP/1.1 + JSON on an asyncio loop. Calls run on a thread pool
+    # under the core's readers-writer lock, so reads from many desks overlap and a slow call holds up only
+    # its own connection; connections are kept alive (and may pipeline) until the client closes them or
+    # they sit idle.
+    def __init__(self, hms, host=SERVICE_HOST, port=SERVICE_PORT, metrics_file=None):
+        self.hms = hms
+        self.host = host
+        self.port = port
+        self.metrics_file = metrics_file  # Prometheus text file rewritten every METRICS_EXPORT_MS, if set
+        self.calls = {name: getattr(hms, name) for name in SERVICE_METHODS}
+        self.calls["page"] = self.page
+        self.calls["notifications"] = self.notifications
+        self.calls["metrics"] = METRICS.summary
+        self.notices = deque(maxlen=MAX_NOTIFICATIONS)  # (sequence, message); each desk asks for what it has not seen
+        self.notice_sequence = 0
+        self.notice_lock = threading.Lock()  # Reminders are sent from the worker threads
+        hms.set_reminder_sink(self.notify)
+        self.connections = {}  # Handler task -> stream writer, so stopping can close idle keep-alive connections
+        self.loop = None
+        self.workers = None
+
+    async def run(self, ready=None):
+        import asyncio  # Imported where it is used, so a window talking to a shared service never loads it
+        from concurrent.futures import ThreadPoolExecutor
+        self.loop = asyncio.get_running_loop()
+        self.workers = ThreadPoolExecutor(max_workers=SERVICE_THREADS, thread_name_prefix="hms-service")
+        self.stopping = asyncio.Event()
+        self.rearm = asyncio.Event()
+        server = await asyncio.start_server(self.handle, self.host, self.port, backlog=SERVICE_BACKLOG)
+        self.port = server.sockets[0].getsockname()[1]  # The real port when 0 asked for any free one
+        if ready is not None:
+            ready()
+        tasks = [asyncio.create_task(self.flush_periodically()), asyncio.create_task(self.remind())]
+        if self.metrics_file:
+            tasks.append(asyncio.create_task(self.export_metrics_periodically()))
+        try:
+            async with server:
+                await self.stopping.wait()
+                for writer in self.connections.values():
+                    writer.close()
+                await asyncio.gather(*self.connections, return_exceptions=True)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.workers.shutdown()
+            self.hms.flush()
+
+    def stop(self):
+        # Safe to call from any thread
+        self.loop.call_soon_threadsafe(self.stopping.set)
+
+    async def handle(self, reader, writer):
+        import asyncio
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), SERVICE_IDLE_TIMEOUT)
+                    request_line, *header_lines = head[:-4].decode("latin-1").split("\r\n")
+                    method, target, version = request_line.split(" ", 2)
+                    headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(":") for line in header_lines)}
+                    body = await reader.readexactly(int(headers.get("content-length", 0)))  # Content-Length bodies only
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError, ValueError):
+                    break
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if isinstance(payload, str):  # Metrics scrape
+                    data, content_type = payload.encode(), b"text/plain; version=0.0.4"
+                elif isinstance(payload, bytes):  # A call's result, already encoded by its worker
+                    data, content_type = payload, b"application/json"
+                else:
+                    data, content_type = json.dumps(payload, default=service_json).encode(), b"application/json"
+                writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n%s" % (status, HTTPStatus(status).phrase.encode(), content_type, len(data), b"keep-alive" if keep_alive else b"close", data))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[asyncio.current_task()]
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        # Returns (status, JSON payload) for one request
+        path = target.partition("?")[0]
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, METRICS.prometheus()
+        name = path[len("/api/"):] if path.startswith("/api/") else None
+        if name not in self.calls:
+            return 404, {"error": f"Unknown call {path}"}
+        try:
+            arguments = json.loads(body) if body else {}
+            if not isinstance(arguments, dict):
+                raise ValueError("arguments must be a JSON object")
+            for argument in SERVICE_TIME_ARGUMENTS:
+                if isinstance(arguments.get(argument), str):
+                    arguments[argument] = datetime.fromisoformat(arguments[argument])
+            payload = await self.loop.run_in_executor(self.workers, self.call, name, arguments)
+        except BookingError as error:
+            return 409, {"error": str(error)}
+        except (ValueError, TypeError, KeyError) as error:
+            return 400, {"error": f"{type(error).__name__}: {error}"}
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+        if name in ("schedule_appointment", "send_reminder"):
+            self.rearm.set()  # The next reminder may now be due sooner
+        return 200, payload
+
+    def call(self, name, arguments):
+        # Runs on a worker thread. Results can share lists and records with the live state, so they are
+        # encoded before any writer can change them.
+        result = self.calls[name](**arguments)
+        with self.hms.reading():
+            return json.dumps({"result": result}, default=service_json).encode()
+
+    def page(self, entity, start=0, stop=None):
+        # Rows start:stop of an entity; a negative start counts from the end, as in slicing
+        with self.hms.reading():
+            rows = SERVICE_PAGES[entity](self.hms)
+            total = len(rows)
+            start = max(0, total + start) if start < 0 else start
+            rows = rows[start:stop] if isinstance(rows, Sequence) else list(itertools.islice(rows, start, stop))
+            if entity == "tokens":  # Waiting lists show who holds each token
+                rows = [dict(entry.as_dict(), patient_name=getattr(self.hms.get_patient(entry.patient_id), "name", None)) for entry in rows]
+        return {"total": total, "start": start, "rows": rows}
+
+    def notify(self, message):
+        with self.notice_lock:
+            self.notice_sequence += 1
+            self.notices.append((self.notice_sequence, message))
+
+    def notifications(self, since=0):
+        with self.notice_lock:
+            return {"next": self.notice_sequence + 1, "messages": [message for sequence, message in self.notices if sequence >= since]}
+
+    async def flush_periodically(self):
+        # Commit any partially filled batch so a crash loses at most one interval of writes
+        import asyncio
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL_MS / 1000)
+            await self.loop.run_in_executor(self.workers, self.hms.flush)  # Waits for the write lock
+
+    async def export_metrics_periodically(self):
+        import asyncio
+        while True:
+            await asyncio.sleep(METRICS_EXPORT_MS / 1000)
+            try:
+                METRICS.write(self.metrics_file)
+            except OSError as error:
+                print(f"Could not write metrics to {self.metrics_file}: {error}", file=sys.stderr)
+
+    async def remind(self):
+        # Send whatever is due, then sleep until the next reminder or until a booking re-arms the timer
+        import asyncio
+        while True:
+            self.rearm.clear()
+            await self.loop.run_in_executor(self.workers, self.hms.send_reminder)
+            next_due = await self.loop.run_in_executor(self.workers, self.hms.next_reminder_due)
+            delay = MAX_REMINDER_DELAY_MS / 1000
+            if next_due is not None:
+                delay = min(max((next_due - datetime.now()).total_seconds(), 0), delay)
+            try:
+                await asyncio.wait_for(self.rearm.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+instrument(HMSService, "service", names=("page", "notifications"))
+
+class ServiceThread(threading.Thread):
+    # Runs an HMSService on its own event loop so a window or the load test can host one in-process.
+    # start() returns once the service is listening; stop() shuts it down and closes the system.
+    def __init__(self, hms, host=SERVICE_HOST, port=0):
+        super().__init__(daemon=True)
+        self.service = HMSService(hms, host, port)
+        self.listening = threading.Event()
+        self.error = None
+
+    def run(self):
+        try:
+            import asyncio
+            asyncio.run(self.service.run(self.listening.set))
+        except Exception as error:
+            self.error = error
+        finally:
+            self.service.hms.close()
+            self.listening.set()
+
+    def start(self):
+        super().start()
+        self.listening.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    @property
+    def address(self):
+        return f"{self.service.host}:{self.service.port}"
+
+    def stop(self):
+        self.service.stop()
+        self.join()
+
+class ServiceClient:
+    # Blocking JSON client holding one keep-alive connection per thread, so a worker pool can call concurrently
+    def __init__(self, address, timeout=30):
+        host, _, port = address.rpartition(":")
+        self.host = host or SERVICE_HOST
+        self.port = int(port)
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def call(self, method, **arguments):
+        import http.client  # Pulls in ssl, so it is imported here rather than before the login window
+        body = json.dumps(arguments, default=service_json).encode()
+        while True:
+            connection = getattr(self.local, "connection", None)
+            if connection is not None and time.monotonic() - self.local.used_at > SERVICE_IDLE_TIMEOUT / 2:
+                connection.close()  # The service may be about to drop it; do not risk a write on it
+                connection = None
+            reused = connection is not None
+            if not reused:
+                connection = self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            sent = False
+            try:
+                connection.request("POST", f"/api/{method}", body, {"Content-Type": "application/json"})
+                sent = True
+                response = connection.getresponse()
+                payload = json.loads(response.read() or b"{}")
+                self.local.used_at = time.monotonic()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                connection.close()
+                self.local.connection = None
+                # A reused connection may have been dropped by the service. Retry once on a new one if the
+                # request never went out or only reads; a write the service may have applied is not resent.
+                if not reused or (sent and method not in SERVICE_READ_ONLY):
+                    raise
+        if response.status != 200:
+            raise ServiceError(response.status, payload.get("error", response.reason))
+        return payload["result"]
+
+def load_tk():
+    # Tk is imported only when a window is opened, so the batch commands (serve, import, bench...) run without it
+    global tk, filedialog, messagebox, ttk
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+
+class VirtualListView:
+    # Treeview that only materializes the rows on screen; the scrollbar maps over the whole source.
+    # count() returns the number of rows, rows(start, stop) returns that slice as value tuples.
+    def __init__(self, parent, columns, count, rows, height=10, width=120):
+        self.count = count
+        self.rows = rows
+        self.height = height
+        self.offset = 0
+        self.total = 0
+        self.follow_tail = True  # Keep showing the newest rows when already at the end
+        self.redraw_job = None
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", height=height, selectmode="browse")
+        for column in columns:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=width, stretch=True)
+        self.scrollbar = tk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.items = [self.tree.insert("", tk.END, values=()) for _ in range(height)]  # Fixed pool of row widgets
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self.on_wheel)
+        self.redraw()
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.total))
+        elif action == "scroll":
+            self.scroll_to(self.offset + int(amount) * (self.height if unit == "pages" else 1))
+
+    def on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - 3)
+        else:
+            self.scroll_to(self.offset + 3)
+        return "break"
+
+    def scroll_to(self, offset):
+        self.offset = max(0, min(offset, self.total - self.height))
+        self.redraw()
+
+    def set_source(self, count, rows, follow_tail=True):
+        # Show another row source (e.g. search results) from its start
+        self.count = count
+        self.rows = rows
+        self.follow_tail = follow_tail
+        self.offset = 0
+        self.total = 0
+        self.refresh()
+
+    def refresh(self):
+        # Coalesce bursts of changes (e.g. many adds in one event) into a single redraw when idle
+        if self.redraw_job is None:
+            self.redraw_job = self.tree.after_idle(self.redraw)
+
+    def redraw(self):
+        self.redraw_job = None
+        following = self.follow_tail and self.offset + self.height >= self.total
+        self.total = self.count()
+        self.offset = max(0, self.total - self.height) if following else max(0, min(self.offset, self.total - self.height))
+        values = self.rows(self.offset, self.offset + self.height)
+        for index, item in enumerate(self.items):
+            if index < len(values):
+                self.tree.item(item, values=values[index])
+                self.tree.move(item, "", index)
+            else:
+                self.tree.detach(item)
+        if self.total:
+            self.scrollbar.set(self.offset / self.total, min(1.0, (self.offset + self.height) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+class RemotePages:
+    # Source for a VirtualListView backed by the service's "page" call. count() and rows() answer from the
+    # last fetched window; a miss shows blank rows, fetches the window off the Tk thread and redraws.
+    def __init__(self, app, entity, row, margin=50):
+        self.app = app
+        self.entity = entity
+        self.row = row  # JSON row -> tuple of column values
+        self.margin = margin  # Extra rows fetched on each side so small scrolls stay local
+        self.view = None
+        self.total = 0
+        self.start = 0
+        self.window = []
+        self.requested = None
+        self.sequence = 0
+        self.follow_tail = True  # False for orders where new rows do not arrive at the end
+        app.pages.append(self)  # So the periodic sync reloads it
+
+    def count(self):
+        return self.total
+
+    def switch(self, entity, follow_tail=True):
+        # List another entity (or another order of the same one) from its start
+        self.entity = entity
+        self.follow_tail = follow_tail
+        self.total = 0
+        self.window = []
+        self.start = 0
+        self.sequence += 1
+        self.requested = None
+
+    def rows(self, start, stop):
+        stop = min(stop, self.total)
+        if start >= stop or self.start <= start and stop <= self.start + len(self.window):
+            return [self.row(row) for row in self.window[start - self.start:stop - self.start]]
+        self.fetch(max(0, start - self.margin), stop + self.margin)
+        return [()] * (stop - start)
+
+    def reload(self):
+        # Re-read the visible window, e.g. after a change here or by another desk
+        self.requested = None
+        if self.view is not None:
+            self.fetch(max(0, self.view.offset - self.margin), self.view.offset + self.view.height + self.margin, follow=self.follow_tail and self.view.offset + self.view.height >= self.total)
+        else:
+            self.fetch(0, self.margin)
+
+    def fetch(self, start, stop, follow=False):
+        if self.requested == (start, stop):
+            return
+        self.requested = (start, stop)
+        self.sequence += 1
+        sequence = self.sequence
+        if follow:  # Showing the newest rows; ask for the tail so appended rows arrive in the same call
+            start, stop = -(stop - start), None
+        self.app.request("page", lambda result: self.loaded(sequence, result), self.app.report_service_error, entity=self.entity, start=start, stop=stop)
+
+    def loaded(self, sequence, result):
+        if sequence != self.sequence:  # A newer window was asked for meanwhile
+            return
+        self.requested = None
+        self.total = result["total"]
+        self.start = result["start"]
+        self.window = result["rows"]
+        if self.view is not None:
+            self.view.refresh()
+
+class ListSearch:
+    # Search boxes for a list view: after a pause in typing, runs a search call on the service and shows
+    # the results in the view; once the boxes are cleared the view goes back to its full list
+    def __init__(self, app, view, pages, method, arguments, row):
+        self.app = app
+        self.view = view
+        self.pages = pages
+        self.method = method
+        self.arguments = arguments  # () -> keyword arguments for the call, or None when nothing is typed
+        self.row = row
+        self.results = []
+        self.active = False
+        self.job = None
+        self.sequence = 0
+
+    def bind(self, *entries):
+        for entry in entries:
+            entry.bind("<KeyRelease>", self.changed)
+
+    def changed(self, event=None):
+        if self.job is not None:
+            self.view.tree.after_cancel(self.job)
+        self.job = self.view.tree.after(SEARCH_DELAY_MS, self.run)
+
+    def run(self):
+        self.job = None
+        self.sequence += 1
+        arguments = self.arguments()
+        if arguments is None:
+            if self.active:
+                self.active = False
+                self.view.set_source(self.pages.count, self.pages.rows, self.pages.follow_tail)
+            return
+        sequence = self.sequence
+        self.app.request(self.method, lambda results: self.show(sequence, results), **arguments)
+
+    def show(self, sequence, results):
+        if sequence != self.sequence:  # The boxes changed again while this search was running
+            return
+        self.results = results
+        self.active = True
+        self.view.set_source(lambda: len(self.results), lambda start, stop: [self.row(result) for result in self.results[start:stop]], follow_tail=False)
+
+class StallWatchdog:
+    # Heartbeat on the Tk event loop: a beat that fires much later than scheduled means the loop was
+    # blocked. Each stall is logged with the slowest instrumented handlers that ran since the previous beat.
+    def __init__(self, widget, metrics=None, interval_ms=HEARTBEAT_MS, threshold_ms=STALL_THRESHOLD_MS, log=sys.stderr):
+        self.widget = widget
+        self.metrics = metrics or METRICS
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.log = log
+        self.expected = None
+
+    def start(self):
+        self.expected = time.perf_counter() + self.interval
+        self.widget.after(int(self.interval * 1000), self.beat)
+
+    def beat(self):
+        now = time.perf_counter()
+        late = now - self.expected
+        slowest = self.metrics.take_slowest()
+        if late >= self.threshold and self.metrics.sample_every:
+            culprits = ", ".join(f"{name} {seconds * 1000:.0f} ms" for seconds, name in slowest if seconds >= late / 10)
+            self.metrics.record_stall(late, culprits or "outside the instrumented handlers", self.log)
+        self.start()
 
 class App:
     def __init__(self, root):
@@ -91,6 +2395,7 @@ class App:
         self.admin_password_entry.pack(pady=5)
 
         tk.Button(self.root, text="Login", command=self.admin_login, bg="#4db6ac", fg="white").pack(pady=20)
+        self.root.after_idle(self.report_startup, "login_window", STARTED_AT, LOGIN_TARGET_SECONDS)  # Runs once the window is drawn
 
     def admin_login(self):
         admin_id = self.admin_id_entry.get()
@@ -98,6 +2403,7 @@ class App:
         
         # Replace with actual admin credentials
         if admin_id == "admin" and admin_password == "password":
+         self.logged_in_at = time.perf_counter()
          self.root.destroy()  # Close the login window
          self.open_main_application()
         else:
@@ -105,6 +2411,7 @@ class App:
 
     def open_main_application(self):
         main_app = tk.Tk()
+        self.main_app = main_app
         main_app.title("Hospital Management System")
         main_app.geometry("800x600")
         main_app.configure(bg="#e0f7fa")
@@ -119,6 +2426,8 @@ class App:
         self.billing_tab = ttk.Frame(self.tab_control)
         self.ward_tab = ttk.Frame(self.tab_control)  # New tab for ward management
         self.token_tab = ttk.Frame(self.tab_control)  # New tab for token management
+        self.dashboard_tab = ttk.Frame(self.tab_control)
+        self.diagnostics_tab = ttk.Frame(self.tab_control)  # Hidden until Ctrl+Shift+D
 
         self.tab_control.add(self.patient_tab, text='Patients')
         self.tab_control.add(self.doctor_tab, text='Doctors')
@@ -128,22 +2437,28 @@ class App:
         self.tab_control.add(self.billing_tab, text='Billing')
         self.tab_control.add(self.token_tab, text='Tokens')  # Add token tab
         self.tab_control.add(self.ward_tab, text='Wards')  # Add ward tab
+        self.tab_control.add(self.dashboard_tab, text='Dashboard')
         self.tab_control.pack(expand=1, fill='both')
 
-        self.hms = HospitalManagementSystem()
-        self.create_patient_tab()
-        self.create_doctor_tab()
-        self.create_appointment_tab()
-        self.create_feedback_tab()
-        self.create_complaint_tab()
-        self.create_billing_tab()
-        self.create_token_tab()  # Create token management tab
-        self.create_ward_tab()  # Create ward management tab
-
-        # Call the reminder function periodically
-        self.reminder_button = tk.Button(main_app, text="Send Reminders", command=self.hms.send_reminder, bg="#ffcc00", fg="black", font=("Arial", 12))
+        # Each tab is built the first time it is shown, so the window does not wait for all of them
+        self.tab_builders = {str(tab): create for tab, create in (
+            (self.patient_tab, self.create_patient_tab), (self.doctor_tab, self.create_doctor_tab), (self.appointment_tab, self.create_appointment_tab),
+            (self.feedback_tab, self.create_feedback_tab), (self.complaint_tab, self.create_complaint_tab), (self.billing_tab, self.create_billing_tab),
+            (self.token_tab, self.create_token_tab), (self.ward_tab, self.create_ward_tab), (self.dashboard_tab, self.create_dashboard_tab),
+            (self.diagnostics_tab, self.create_diagnostics_tab))}
+        self.pages = []  # Lists of the tabs built so far; RemotePages add themselves
+        self.tab_control.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
+        self.connect_service()
+        main_app.protocol("WM_DELETE_WINDOW", self.close_main_application)
+
+        # Reminders are sent automatically when due; the button forces an immediate check
+        self.reminder_button = tk.Button(main_app, text="Send Reminders", command=self.schedule_reminders, bg="#ffcc00", fg="black", font=("Arial", 12))
         self.reminder_button.pack(pady=10)
 
+        self.notification_listbox = tk.Listbox(main_app, width=100, height=3)
+        self.notification_listbox.pack(pady=5)
+
         # Button to show ward statistics
         self.show_ward_stats_button = tk.Button(main_app, text="Show Ward Statistics", command=self.show_ward_statistics, bg="#4db6ac", fg="white", font=("Arial", 12))
         self.show_ward_stats_button.pack(pady=10)
@@ -151,9 +2466,126 @@ class App:
         # Contact option
         self.contact_button = tk.Button(main_app, text="Contact Support", command=self.contact_support, bg="#d32f2f", fg="white", font=("Arial", 12))
         self.contact_button.pack(pady=10)
-
+        if self.service_loading:
+            self.notification_listbox.insert(tk.END, "Loading hospital data...")
+
+        self.build_tab(self.patient_tab)
+        self.poll_responses()
+        self.sync()
+        self.watchdog = StallWatchdog(main_app)
+        self.watchdog.start()
+        main_app.bind("<Control-D>", self.toggle_diagnostics)
+        if METRICS_FILE:
+            self.export_metrics_periodically()
+        main_app.after_idle(self.report_startup, "main_window", self.logged_in_at, MAIN_WINDOW_TARGET_SECONDS)
+        main_app.after(PRELOAD_DELAY_MS, self.preload_modules)
         main_app.mainloop()
 
+    def report_startup(self, stage, since, target):
+        # Startup phases are recorded with the other metrics and reported when they miss their target
+        seconds = time.perf_counter() - since
+        METRICS.record(f"startup.{stage}", seconds)
+        if seconds > target:
+            print(f"Startup: {stage.replace('_', ' ')} took {seconds:.2f}s (target {target:.2f}s)", file=sys.stderr)
+
+    def preload_modules(self):
+        # Import what later tabs need on a background thread, so opening them does not stall the window
+        threading.Thread(target=lambda: [importlib.import_module(name) for name in PRELOAD_MODULES], daemon=True).start()
+
+    def build_tab(self, tab):
+        create = self.tab_builders.pop(str(tab), None)
+        if create is not None:
+            create()
+
+    def connect_service(self):
+        # Desks share one service when HMS_SERVICE is set; otherwise this window hosts its own on localhost.
+        # Either way the window only talks to the system through service calls on worker threads. Starting
+        # the service (and loading the data) happens on one of those threads too, so the window is usable
+        # at once; calls made in the meantime wait for it.
+        from concurrent.futures import ThreadPoolExecutor
+        self.service = None
+        self.service_loading = SERVICE_ADDRESS is None
+        self.workers = ThreadPoolExecutor(max_workers=SERVICE_WORKERS)
+        self.responses = queue.Queue()  # Finished calls waiting for their callbacks on the Tk thread
+        self.notification_sequence = 0
+        self.connection = self.workers.submit(self.start_service)
+        self.connection.add_done_callback(lambda future: self.responses.put((future, self.service_connected, self.report_service_error)))
+
+    def start_service(self):
+        # Runs on a worker thread; returns the client the other calls use
+        address = SERVICE_ADDRESS
+        if address is None:
+            self.service = ServiceThread(HospitalManagementSystem(make_backend(), columnar=COLUMNAR)).start()
+            address = self.service.address
+        return ServiceClient(address)
+
+    def service_connected(self, client):
+        if self.service_loading:
+            self.service_loading = False
+            self.notification_listbox.insert(tk.END, f"Hospital data loaded in {time.perf_counter() - self.logged_in_at:.1f}s.")
+            self.report_startup("data_loaded", self.logged_in_at, COLD_START_TARGET_SECONDS)
+
+    def call_service(self, method, **arguments):
+        return self.connection.result().call(method, **arguments)
+
+    def request(self, method, on_done=None, on_error=None, **arguments):
+        # Call the service without blocking the window; on_done(result) or on_error(error) run on the Tk thread
+        future = self.workers.submit(self.call_service, method, **arguments)
+        future.add_done_callback(lambda future: self.responses.put((future, on_done, on_error)))
+
+    def poll_responses(self):
+        while True:
+            try:
+                future, on_done, on_error = self.responses.get_nowait()
+            except queue.Empty:
+                break
+            error = future.exception()
+            if error is None:
+                if on_done is not None:
+                    on_done(future.result())
+            elif on_error is not None:
+                on_error(error)
+            elif isinstance(error, ServiceError):
+                messagebox.showerror("Error", str(error))
+            else:
+                messagebox.showerror("Service Error", f"The hospital service is unavailable: {error}")
+        self.main_app.after(RESPONSE_POLL_MS, self.poll_responses)
+
+    def report_service_error(self, error):
+        # Background refreshes report failures in the notification list instead of popping up dialogs
+        self.notification_listbox.insert(tk.END, f"Service error: {error}")
+        self.notification_listbox.see(tk.END)
+
+    def sync(self):
+        # Pick up reminders and changes made at other desks
+        self.request("notifications", self.show_notifications, self.report_service_error, since=self.notification_sequence)
+        for pages in self.pages:
+            pages.reload()
+        if str(self.token_tab) not in self.tab_builders:
+            self.refresh_token_stats()
+        self.main_app.after(SYNC_INTERVAL_MS, self.sync)
+
+    def close_main_application(self):
+        self.workers.shutdown(wait=False, cancel_futures=True)
+        self.connection.add_done_callback(self.stop_service)  # Waits for a service that is still loading
+        self.main_app.destroy()
+
+    def stop_service(self, connection):
+        if self.service is not None:
+            self.service.stop()  # Flushes and closes the system this window was hosting
+
+    def schedule_reminders(self):
+        # The service sends reminders when due; the button forces an immediate check
+        self.request("send_reminder", lambda sent: self.request("notifications", self.show_notifications, since=self.notification_sequence))
+
+    def show_notifications(self, notifications):
+        self.notification_sequence = notifications["next"]
+        for message in notifications["messages"]:
+            self.notification_listbox.insert(tk.END, message)
+        if self.notification_listbox.size() > MAX_NOTIFICATIONS:
+            self.notification_listbox.delete(0, self.notification_listbox.size() - MAX_NOTIFICATIONS - 1)
+        self.notification_listbox.see(tk.END)
+
     def create_patient_tab(self):
         tk.Label(self.patient_tab, text="Patient Name:", bg="#e0f7fa").grid(row=0, column=0, padx=10, pady=10)
         self.patient_name_entry = tk.Entry(self.patient_tab)
@@ -171,38 +2603,84 @@ class App:
         self.patient_ailment_entry = tk.Entry(self.patient_tab)
         self.patient_ailment_entry.grid(row=3, column=1, padx=10, pady=10)
 
-        tk.Button(self.patient_tab, text="Add Patient", command=self.add_patient, bg="#00796b", fg="white").grid(row=4, columnspan=2, pady=10)
-
-        self.patient_listbox = tk.Listbox(self.patient_tab, width=50)
-        self.patient_listbox.grid(row=5, columnspan=2, padx=10, pady=10)
-
-        tk.Button(self.patient_tab, text="Sort Patients", command=self.sort_patients, bg="#ff9800", fg="white").grid(row=6, columnspan=2, pady=10)
+        tk.Label(self.patient_tab, text="Priority:", bg="#e0f7fa").grid(row=4, column=0, padx=10, pady=10)
+        self.patient_priority_entry = ttk.Combobox(self.patient_tab, values=PRIORITIES, state="readonly")
+        self.patient_priority_entry.set("Normal")
+        self.patient_priority_entry.grid(row=4, column=1, padx=10, pady=10)
+
+        tk.Label(self.patient_tab, text="Department:", bg="#e0f7fa").grid(row=5, column=0, padx=10, pady=10)
+        self.patient_department_entry = ttk.Combobox(self.patient_tab, values=DEPARTMENTS, state="readonly")
+        self.patient_department_entry.set("General OPD")
+        self.patient_department_entry.grid(row=5, column=1, padx=10, pady=10)
+
+        tk.Button(self.patient_tab, text="Add Patient", command=self.add_patient, bg="#00796b", fg="white").grid(row=6, columnspan=2, pady=10)
+
+        patient_row = lambda patient: (patient['id'], patient['name'], patient['age'], patient['gender'], patient['ailment'])
+        self.patient_pages = RemotePages(self, "patients", patient_row)
+        self.patient_view = self.patient_pages.view = VirtualListView(self.patient_tab, ("ID", "Name", "Age", "Gender", "Ailment"), self.patient_pages.count, self.patient_pages.rows, width=100)
+        self.patient_view.grid(row=7, columnspan=2, padx=10, pady=10)
+
+        self.sort_patients_button = tk.Button(self.patient_tab, text="Sort Patients", command=self.sort_patients, bg="#ff9800", fg="white")
+        self.sort_patients_button.grid(row=8, columnspan=2, pady=10)
+
+        # Type-ahead search by name prefix, ailment and age range ("30" or "30-40")
+        search_frame = tk.Frame(self.patient_tab, bg="#e0f7fa")
+        search_frame.grid(row=9, columnspan=2, pady=5)
+        tk.Label(search_frame, text="Search Name:", bg="#e0f7fa").pack(side=tk.LEFT)
+        self.patient_search_entry = tk.Entry(search_frame, width=15)
+        self.patient_search_entry.pack(side=tk.LEFT, padx=5)
+        tk.Label(search_frame, text="Ailment:", bg="#e0f7fa").pack(side=tk.LEFT)
+        self.patient_search_ailment_entry = tk.Entry(search_frame, width=12)
+        self.patient_search_ailment_entry.pack(side=tk.LEFT, padx=5)
+        tk.Label(search_frame, text="Age:", bg="#e0f7fa").pack(side=tk.LEFT)
+        self.patient_search_age_entry = tk.Entry(search_frame, width=8)
+        self.patient_search_age_entry.pack(side=tk.LEFT, padx=5)
+        self.patient_search = ListSearch(self, self.patient_view, self.patient_pages, "search_patients", self.patient_search_arguments, patient_row)
+        self.patient_search.bind(self.patient_search_entry, self.patient_search_ailment_entry, self.patient_search_age_entry)
 
         self.refresh_patient_list()
 
+    def patient_search_arguments(self):
+        arguments = {}
+        if self.patient_search_entry.get().strip():
+            arguments["prefix"] = self.patient_search_entry.get().strip()
+        if self.patient_search_ailment_entry.get().strip():
+            arguments["ailment"] = self.patient_search_ailment_entry.get().strip()
+        ages = [age.strip() for age in self.patient_search_age_entry.get().split("-")]
+        if all(age.isdigit() for age in ages) and len(ages) <= 2:
+            arguments["min_age"], arguments["max_age"] = int(ages[0]), int(ages[-1])
+        return arguments or None
+
     def add_patient(self):
         name = self.patient_name_entry.get()
         age = self.patient_age_entry.get()
         gender = self.patient_gender_entry.get()
         ailment = self.patient_ailment_entry.get()
         if name and age.isdigit() and ailment and gender:
-            self.hms.add_patient(name, int(age), gender, ailment)
-            self.refresh_patient_list()
+            self.request("add_patient", self.patient_added, name=name, age=int(age), gender=gender, ailment=ailment, priority=self.patient_priority_entry.get(), department=self.patient_department_entry.get())
             self.patient_name_entry.delete(0, tk.END)
             self.patient_age_entry.delete(0, tk.END)
             self.patient_gender_entry.set('')  # Reset the gender dropdown
             self.patient_ailment_entry.delete(0, tk.END)
+            self.patient_priority_entry.set("Normal")
         else:
             messagebox.showerror("Input Error", "Please enter valid patient details.")
 
+    def patient_added(self, patient_id):
+        self.refresh_patient_list()
+        if str(self.token_tab) not in self.tab_builders:  # An unbuilt token tab loads fresh when first shown
+            self.refresh_token_list()
+
     def refresh_patient_list(self):
-        self.patient_listbox.delete(0, tk.END)
-        patients = self.hms.get_patients()
-        for patient in patients:
-            self.patient_listbox.insert(tk.END, f"ID: {patient['id']}, Name: {patient['name']}, Age: {patient['age']}, Gender: {patient['gender']}, Ailment: {patient['ailment']}")
+        self.patient_pages.reload()
 
     def sort_patients(self):
-        self.hms.patients.sort(key=lambda x: x['name'])  # Sort by patient name
+        # Toggles name order, read from the service's name index; the stored ID order never changes
+        by_name = self.patient_pages.entity == "patients"
+        self.patient_pages.switch("patients_by_name" if by_name else "patients", follow_tail=not by_name)
+        self.sort_patients_button.config(text="ID Order" if by_name else "Sort Patients")
+        if not self.patient_search.active:
+            self.patient_view.set_source(self.patient_pages.count, self.patient_pages.rows, self.patient_pages.follow_tail)
         self.refresh_patient_list()
 
     def create_doctor_tab(self):
@@ -220,8 +2698,21 @@ class App:
 
         tk.Button(self.doctor_tab, text="Add Doctor", command=self.add_doctor, bg="#4db6ac", fg="white", font=("Arial", 12)).grid(row=3, columnspan=2, pady=10)
 
-        self.doctor_listbox = tk.Listbox(self.doctor_tab, width=50, font=("Arial", 12))
-        self.doctor_listbox.grid(row=4, columnspan=2, padx=10, pady=10)
+        doctor_row = lambda doctor: (doctor['id'], doctor['name'], doctor['specialization'], doctor['contact'])
+        self.doctor_pages = RemotePages(self, "doctors", doctor_row)
+        self.doctor_view = self.doctor_pages.view = VirtualListView(self.doctor_tab, ("ID", "Name", "Specialization", "Contact"), self.doctor_pages.count, self.doctor_pages.rows)
+        self.doctor_view.grid(row=4, columnspan=2, padx=10, pady=10)
+
+        search_frame = tk.Frame(self.doctor_tab, bg="#ffe0b2")
+        search_frame.grid(row=5, columnspan=2, pady=5)
+        tk.Label(search_frame, text="Search Name:", bg="#ffe0b2", font=("Arial", 12)).pack(side=tk.LEFT)
+        self.doctor_search_entry = tk.Entry(search_frame, width=15, font=("Arial", 12))
+        self.doctor_search_entry.pack(side=tk.LEFT, padx=5)
+        tk.Label(search_frame, text="Specialization:", bg="#ffe0b2", font=("Arial", 12)).pack(side=tk.LEFT)
+        self.doctor_search_specialization_entry = tk.Entry(search_frame, width=15, font=("Arial", 12))
+        self.doctor_search_specialization_entry.pack(side=tk.LEFT, padx=5)
+        self.doctor_search = ListSearch(self, self.doctor_view, self.doctor_pages, "search_doctors", self.doctor_search_arguments, doctor_row)
+        self.doctor_search.bind(self.doctor_search_entry, self.doctor_search_specialization_entry)
 
         self.refresh_doctor_list()
 
@@ -230,8 +2721,7 @@ class App:
         specialization = self.doctor_specialization_entry.get()
         contact = self.doctor_contact_entry.get()
         if name and specialization and contact:
-            self.hms.add_doctor(name, specialization, contact)
-            self.refresh_doctor_list()
+            self.request("add_doctor", lambda doctor_id: self.refresh_doctor_list(), name=name, specialization=specialization, contact=contact)
             self.doctor_name_entry.set('')  # Reset the doctor name dropdown
             self.doctor_specialization_entry.set('')  # Reset the specialization dropdown
             self.doctor_contact_entry.delete(0, tk.END)
@@ -239,10 +2729,11 @@ class App:
             messagebox.showerror("Input Error", "Please enter valid doctor details.")
 
     def refresh_doctor_list(self):
-        self.doctor_listbox.delete(0, tk.END)
-        doctors = self.hms.get_doctors()
-        for doctor in doctors:
-            self.doctor_listbox.insert(tk.END, f"ID: {doctor['id']}, Name: {doctor['name']}, Specialization: {doctor['specialization']}, Contact: {doctor['contact']}")
+        self.doctor_pages.reload()
+
+    def doctor_search_arguments(self):
+        prefix, specialization = self.doctor_search_entry.get().strip(), self.doctor_search_specialization_entry.get().strip()
+        return {"prefix": prefix, "specialization": specialization or None} if prefix or specialization else None
 
     def create_appointment_tab(self):
         tk.Label(self.appointment_tab, text="Patient ID:", bg="#c5e1a5", font=("Arial", 12)).grid(row=0, column=0)
@@ -259,6 +2750,17 @@ class App:
 
         tk.Button(self.appointment_tab, text="Schedule Appointment", command=self.schedule_appointment, bg="#4db6ac", fg="white", font=("Arial", 12)).grid(row=3, columnspan=2)
 
+        tk.Label(self.appointment_tab, text="Specialization:", bg="#c5e1a5", font=("Arial", 12)).grid(row=4, column=0)
+        self.slot_specialization_entry = ttk.Combobox(self.appointment_tab, values=["Cardiology", "Neurology", "Pediatrics", "Orthopedics", "General Medicine"], font=("Arial", 12))
+        self.slot_specialization_entry.grid(row=4, column=1)
+
+        tk.Button(self.appointment_tab, text="Find Free Slots", command=self.find_free_slots, bg="#ff9800", fg="white", font=("Arial", 12)).grid(row=5, columnspan=2)
+
+        self.free_slot_listbox = tk.Listbox(self.appointment_tab, width=50, height=5)
+        self.free_slot_listbox.grid(row=6, columnspan=2)
+        self.free_slot_listbox.bind("<<ListboxSelect>>", self.use_free_slot)
+        self.free_slots = []
+
     def schedule_appointment(self):
         patient_id = self.appointment_patient_id_entry.get()
         doctor_id = self.appointment_doctor_id_entry.get()
@@ -266,13 +2768,39 @@ class App:
         if patient_id.isdigit() and doctor_id.isdigit() and appointment_time:
             try:
                 appointment_time = datetime.strptime(appointment_time, '%Y-%m-%d %H:%M')
-                self.hms.schedule_appointment(int(patient_id), int(doctor_id), appointment_time)
-                messagebox.showinfo("Success", "Appointment scheduled successfully.")
             except ValueError:
                 messagebox.showerror("Input Error", "Please enter a valid appointment time (YYYY-MM-DD HH:MM).")
+                return
+            # Double bookings and unknown IDs come back as errors from the service's booking checks
+            self.request("schedule_appointment", lambda result: messagebox.showinfo("Success", "Appointment scheduled successfully."), lambda error: messagebox.showerror("Booking Error", str(error)),
+                         patient_id=int(patient_id), doctor_id=int(doctor_id), appointment_time=appointment_time.strftime('%Y-%m-%d %H:%M'))
         else:
             messagebox.showerror("Input Error", "Please enter valid appointment details.")
 
+    def find_free_slots(self):
+        specialization = self.slot_specialization_entry.get()
+        self.free_slot_listbox.delete(0, tk.END)
+        self.free_slots = []
+        if specialization:
+            self.request("find_free_slots", self.show_free_slots, specialization=specialization, count=10)
+
+    def show_free_slots(self, slots):
+        self.free_slots = [(datetime.fromisoformat(moment), doctor) for moment, doctor in slots]
+        for moment, doctor in self.free_slots:
+            self.free_slot_listbox.insert(tk.END, f"{moment.strftime('%Y-%m-%d %H:%M')} - {doctor['name']} (ID: {doctor['id']})")
+        if not self.free_slots:
+            messagebox.showwarning("No Slots", "No free slots found for this specialization.")
+
+    def use_free_slot(self, event):
+        # Fill the booking form from the selected slot
+        selection = self.free_slot_listbox.curselection()
+        if selection:
+            moment, doctor = self.free_slots[selection[0]]
+            self.appointment_doctor_id_entry.delete(0, tk.END)
+            self.appointment_doctor_id_entry.insert(0, str(doctor['id']))
+            self.appointment_time_entry.delete(0, tk.END)
+            self.appointment_time_entry.insert(0, moment.strftime('%Y-%m-%d %H:%M'))
+
     def create_feedback_tab(self):
         tk.Label(self.feedback_tab, text="Feedback:", bg="#ffe0b2", font=("Arial", 12)).grid(row=0, column=0)
         self.feedback_entry = tk.Text(self.feedback_tab, height=5, width=40, font=("Arial", 12))
@@ -281,25 +2809,29 @@ class App:
         tk.Button(self.feedback_tab, text="Submit Feedback", command=self.submit_feedback, bg="#4db6ac", fg="white", font=("Arial", 12)).grid(row=1, columnspan=2)
 
         tk.Label(self.feedback_tab, text="Submitted Feedback:", bg="#ffe0b2", font=("Arial", 12)).grid(row=2, column=0)
-        self.feedback_listbox = tk.Listbox(self.feedback_tab, width=50, height=5)
-        self.feedback_listbox.grid(row=2, column=1)
+        self.feedback_pages = RemotePages(self, "feedback", lambda feedback: (feedback,))
+        self.feedback_view = self.feedback_pages.view = VirtualListView(self.feedback_tab, ("Feedback",), self.feedback_pages.count, self.feedback_pages.rows, height=5, width=400)
+        self.feedback_view.grid(row=2, column=1)
+
+        tk.Label(self.feedback_tab, text="Search:", bg="#ffe0b2", font=("Arial", 12)).grid(row=3, column=0)
+        self.feedback_search_entry = tk.Entry(self.feedback_tab, width=40, font=("Arial", 12))
+        self.feedback_search_entry.grid(row=3, column=1)
+        self.feedback_search = ListSearch(self, self.feedback_view, self.feedback_pages, "search_feedback", lambda: {"query": self.feedback_search_entry.get()} if self.feedback_search_entry.get().strip() else None, lambda feedback: (feedback,))
+        self.feedback_search.bind(self.feedback_search_entry)
 
         self.refresh_feedback_list()
 
     def submit_feedback(self):
         feedback = self.feedback_entry.get("1.0", tk.END).strip()
         if feedback:
-            self.hms.add_feedback(feedback)
+            self.request("add_feedback", lambda result: self.refresh_feedback_list(), feedback=feedback)
             messagebox.showinfo("Success", "Feedback submitted successfully.")
             self.feedback_entry.delete("1.0", tk.END)
-            self.refresh_feedback_list()
         else:
             messagebox.showerror("Input Error", "Please enter your feedback.")
 
     def refresh_feedback_list(self):
-        self.feedback_listbox.delete(0, tk.END)
-        for feedback in self.hms.feedbacks:
-            self.feedback_listbox.insert(tk.END, feedback)
+        self.feedback_pages.reload()
 
     def create_complaint_tab(self):
         tk.Label(self.complaint_tab, text="Complaint:", bg="#ffccbc", font=("Arial", 12)).grid(row=0, column=0)
@@ -309,25 +2841,29 @@ class App:
         tk.Button(self.complaint_tab, text="Submit Complaint", command=self.submit_complaint, bg="#d32f2f", fg="white", font=("Arial", 12)).grid(row=1, columnspan=2)
 
         tk.Label(self.complaint_tab, text="Submitted Complaints:", bg="#ffccbc", font=("Arial", 12)).grid(row=2, column=0)
-        self.complaint_listbox = tk.Listbox(self.complaint_tab, width=50, height=5)
-        self.complaint_listbox.grid(row=2, column=1)
+        self.complaint_pages = RemotePages(self, "complaints", lambda complaint: (complaint,))
+        self.complaint_view = self.complaint_pages.view = VirtualListView(self.complaint_tab, ("Complaint",), self.complaint_pages.count, self.complaint_pages.rows, height=5, width=400)
+        self.complaint_view.grid(row=2, column=1)
+
+        tk.Label(self.complaint_tab, text="Search:", bg="#ffccbc", font=("Arial", 12)).grid(row=3, column=0)
+        self.complaint_search_entry = tk.Entry(self.complaint_tab, width=40, font=("Arial", 12))
+        self.complaint_search_entry.grid(row=3, column=1)
+        self.complaint_search = ListSearch(self, self.complaint_view, self.complaint_pages, "search_complaints", lambda: {"query": self.complaint_search_entry.get()} if self.complaint_search_entry.get().strip() else None, lambda complaint: (complaint,))
+        self.complaint_search.bind(self.complaint_search_entry)
 
         self.refresh_complaint_list()
 
     def submit_complaint(self):
         complaint = self.complaint_entry.get("1.0", tk.END).strip()
         if complaint:
-            self.hms.add_complaint(complaint)
+            self.request("add_complaint", lambda result: self.refresh_complaint_list(), complaint=complaint)
             messagebox.showinfo("Success", "Complaint submitted successfully.")
             self.complaint_entry.delete("1.0", tk.END)
-            self.refresh_complaint_list()
         else:
             messagebox.showerror("Input Error", "Please enter your complaint.")
 
     def refresh_complaint_list(self):
-        self.complaint_listbox.delete(0, tk.END)
-        for complaint in self.hms.complaints:
-            self.complaint_listbox.insert(tk.END, complaint)
+        self.complaint_pages.reload()
 
     def create_billing_tab(self):
         tk.Label(self.billing_tab, text="Patient ID:", bg="#c5e1a5", font=("Arial", 12)).grid(row=0, column=0)
@@ -351,8 +2887,7 @@ class App:
         registration_charge = self.registration_charge_entry.get()
         medicine_cost = self.medicine_cost_entry.get()
         if patient_id.isdigit() and registration_charge.isdigit() and medicine_cost.isdigit():
-            self.hms.add_billing(int(patient_id), int(registration_charge), int(medicine_cost))
-            messagebox.showinfo("Success", "Billing added successfully.")
+            self.request("add_billing", lambda result: messagebox.showinfo("Success", "Billing added successfully."), patient_id=int(patient_id), registration_charge=int(registration_charge), medicine_cost=int(medicine_cost))
             self.billing_patient_id_entry.delete(0, tk.END)
             self.registration_charge_entry.delete(0, tk.END)
             self.medicine_cost_entry.delete(0, tk.END)
@@ -363,30 +2898,48 @@ class App:
         patient_id = self.billing_patient_id_entry.get()
         if patient_id.isdigit():
             patient_id = int(patient_id)
-            for record in self.hms.billing_records:
-                if record["patient_id"] == patient_id:
-                    total_cost = record["total_cost"]
-                    receipt = f"Receipt\n{'-'*20}\nPatient ID: {patient_id}\n"
-                    receipt += f"Registration Charge: {record['registration_charge']} Rupees\n"
-                    receipt += f"Medicine Cost: {record['medicine_cost']} Rupees\n"
-                    receipt += f"Total Amount: {total_cost} Rupees\n"
-                    messagebox.showinfo("Receipt", receipt)
-                    return
-            messagebox.showerror("Error", "No billing record found for this patient ID.")
+            self.request("billing_for", lambda records: self.show_receipt(patient_id, records), patient_id=patient_id)
         else:
             messagebox.showerror("Input Error", "Please enter a valid patient ID.")
 
+    def show_receipt(self, patient_id, records):
+        for record in records:
+            total_cost = record["registration_charge"] + record["medicine_cost"]
+            receipt = f"Receipt\n{'-'*20}\nPatient ID: {patient_id}\n"
+            receipt += f"Registration Charge: {record['registration_charge']} Rupees\n"
+            receipt += f"Medicine Cost: {record['medicine_cost']} Rupees\n"
+            receipt += f"Total Amount: {total_cost} Rupees\n"
+            messagebox.showinfo("Receipt", receipt)
+            return
+        messagebox.showerror("Error", "No billing record found for this patient ID.")
+
     def create_token_tab(self):
         tk.Label(self.token_tab, text="Current Tokens:", bg="#e0f7fa").grid(row=0, column=0, padx=10, pady=10)
-        self.token_listbox = tk.Listbox(self.token_tab, width=50)
-        self.token_listbox.grid(row=1, columnspan=2, padx=10, pady=10)
+        self.token_pages = RemotePages(self, "tokens", lambda entry: (entry['token'], entry['patient_name'] or entry['patient_id'], entry['priority'], entry['department']))
+        self.token_view = self.token_pages.view = VirtualListView(self.token_tab, ("Token", "Patient", "Priority", "Department"), self.token_pages.count, self.token_pages.rows)
+        self.token_view.grid(row=1, columnspan=2, padx=10, pady=10)
+
+        tk.Label(self.token_tab, text="Counter:", bg="#e0f7fa").grid(row=2, column=0, padx=10, pady=10)
+        self.token_counter_entry = ttk.Combobox(self.token_tab, values=["All Departments"] + DEPARTMENTS, state="readonly")
+        self.token_counter_entry.set("All Departments")
+        self.token_counter_entry.grid(row=2, column=1, padx=10, pady=10)
+        self.token_counter_entry.bind("<<ComboboxSelected>>", lambda event: self.refresh_token_stats())
 
-        tk.Button(self.token_tab, text="Call Next Token", command=self.call_next_token, bg="#00796b", fg="white").grid(row=2, columnspan=2, pady=10)
+        tk.Button(self.token_tab, text="Call Next Token", command=self.call_next_token, bg="#00796b", fg="white").grid(row=3, columnspan=2, pady=10)
+
+        self.token_stats_label = tk.Label(self.token_tab, text="", bg="#e0f7fa")
+        self.token_stats_label.grid(row=4, columnspan=2, padx=10, pady=10)
 
         self.refresh_token_list()
 
+    def selected_counter(self):
+        counter = self.token_counter_entry.get()
+        return None if counter == "All Departments" else counter
+
     def call_next_token(self):
-        next_token = self.hms.get_next_token()
+        self.request("get_next_token", self.show_called_token, department=self.selected_counter())
+
+    def show_called_token(self, next_token):
         if next_token is not None:
             messagebox.showinfo("Next Token", f"Next token to be called: {next_token}")
             self.refresh_token_list()
@@ -394,9 +2947,15 @@ class App:
             messagebox.showwarning("No Tokens", "No tokens available to call.")
 
     def refresh_token_list(self):
-        self.token_listbox.delete(0, tk.END)
-        for patient in self.hms.get_patients():
-            self.token_listbox.insert(tk.END, f"Token: {patient['token']}, Patient: {patient['name']}")
+        # Only tokens still waiting are listed
+        self.token_pages.reload()
+        self.refresh_token_stats()
+
+    def refresh_token_stats(self):
+        self.request("get_token_stats", self.show_token_stats, self.report_service_error, department=self.selected_counter())
+
+    def show_token_stats(self, stats):
+        self.token_stats_label.config(text=f"Waiting: {stats['waiting']}, Served: {stats['served']}, Average Wait: {stats['average_wait'] / 60:.1f} min, Served Last Hour: {stats['served_last_hour']}")
 
     def create_ward_tab(self):
         tk.Label(self.ward_tab, text="Ward Name:", bg="#c5e1a5", font=("Arial", 12)).grid(row=0, column=0)
@@ -407,11 +2966,26 @@ class App:
         self.total_beds_entry = tk.Entry(self.ward_tab, font=("Arial", 12))
         self.total_beds_entry.grid(row=1, column=1)
 
-        tk.Button(self.ward_tab, text="Add Ward", command=self.add_ward, bg="#4db6ac", fg="white", font=("Arial", 12)).grid(row=2, columnspan=2)
+        tk.Label(self.ward_tab, text="Ward Type:", bg="#c5e1a5", font=("Arial", 12)).grid(row=2, column=0)
+        self.ward_type_combobox = ttk.Combobox(self.ward_tab, values=WARD_TYPES, font=("Arial", 12))
+        self.ward_type_combobox.set(WARD_TYPES[0])
+        self.ward_type_combobox.grid(row=2, column=1)
+
+        tk.Button(self.ward_tab, text="Add Ward", command=self.add_ward, bg="#4db6ac", fg="white", font=("Arial", 12)).grid(row=3, columnspan=2)
 
-        tk.Label(self.ward_tab, text="Available Wards:", bg="#c5e1a5", font=("Arial", 12)).grid(row=3, column=0)
-        self.ward_listbox = tk.Listbox(self.ward_tab, width=50, height=5)
-        self.ward_listbox.grid(row=3, column=1)
+        tk.Label(self.ward_tab, text="Available Wards:", bg="#c5e1a5", font=("Arial", 12)).grid(row=4, column=0)
+        self.ward_pages = RemotePages(self, "wards", lambda ward: (ward['ward_name'], ward['ward_type'], ward['total_beds'], ward['occupied_beds'], ward['free_beds']))
+        self.ward_view = self.ward_pages.view = VirtualListView(self.ward_tab, ("Ward", "Type", "Total Beds", "Occupied Beds", "Free Beds"), self.ward_pages.count, self.ward_pages.rows, height=5)
+        self.ward_view.grid(row=4, column=1)
+
+        # Admissions: leave the ward name blank to use the ward of the selected type with the most free beds
+        tk.Label(self.ward_tab, text="Patient ID:", bg="#c5e1a5", font=("Arial", 12)).grid(row=5, column=0)
+        self.admission_patient_entry = tk.Entry(self.ward_tab, font=("Arial", 12))
+        self.admission_patient_entry.grid(row=5, column=1)
+
+        tk.Button(self.ward_tab, text="Admit", command=self.admit_patient, bg="#4db6ac", fg="white", font=("Arial", 12)).grid(row=6, column=0)
+        tk.Button(self.ward_tab, text="Transfer", command=self.transfer_patient, bg="#4db6ac", fg="white", font=("Arial", 12)).grid(row=6, column=1)
+        tk.Button(self.ward_tab, text="Discharge", command=self.discharge_patient, bg="#4db6ac", fg="white", font=("Arial", 12)).grid(row=7, columnspan=2)
 
         self.refresh_ward_list()
 
@@ -419,29 +2993,817 @@ class App:
         ward_name = self.ward_name_entry.get()
         total_beds = self.total_beds_entry.get()
         if ward_name and total_beds.isdigit():
-            if self.hms.add_ward(ward_name, int(total_beds)):
-                messagebox.showinfo("Success", "Ward added successfully.")
-                self.refresh_ward_list()
-                self.ward_name_entry.delete(0, tk.END)
-                self.total_beds_entry.delete(0, tk.END)
-            else:
-                messagebox.showerror("Error", "Ward already exists.")
+            self.request("add_ward", self.ward_added, ward_name=ward_name, total_beds=int(total_beds), ward_type=self.ward_type_combobox.get() or WARD_TYPES[0])
         else:
             messagebox.showerror("Input Error", "Please enter valid ward details.")
 
+    def ward_added(self, added):
+        if added:
+            messagebox.showinfo("Success", "Ward added successfully.")
+            self.refresh_ward_list()
+            self.ward_name_entry.delete(0, tk.END)
+            self.total_beds_entry.delete(0, tk.END)
+        else:
+            messagebox.showerror("Error", "Ward already exists.")
+
     def refresh_ward_list(self):
-        self.ward_listbox.delete(0, tk.END)
-        for ward_name, details in self.hms.get_wards().items():
-            self.ward_listbox.insert(tk.END, f"Ward: {ward_name}, Total Beds: {details['total_beds']}, Occupied Beds: {details['occupied_beds']}")
+        self.ward_pages.reload()
+
+    def with_admission_patient(self, action):
+        # Runs action(patient_id) once the service confirms the patient exists
+        patient_id = self.admission_patient_entry.get()
+        if not patient_id.isdigit():
+            messagebox.showerror("Input Error", "Please enter a valid patient ID.")
+            return
+        patient_id = int(patient_id)
+        self.request("get_patient", lambda patient: action(patient_id) if patient else messagebox.showerror("Input Error", "Please enter a valid patient ID."), patient_id=patient_id)
+
+    def admit_patient(self):
+        self.with_admission_patient(self.request_admission)
+
+    def request_admission(self, patient_id):
+        ward_name = self.ward_name_entry.get() or None
+        self.request("admit", lambda admission: self.show_admission(patient_id, admission), patient_id=patient_id, ward_name=ward_name, ward_type=None if ward_name else self.ward_type_combobox.get() or None)
+
+    def show_admission(self, patient_id, admission):
+        if admission:
+            messagebox.showinfo("Success", f"Patient admitted to {admission[0]}, bed {admission[1]}.")
+            self.refresh_ward_list()
+        else:
+            self.request("get_admission", lambda current: messagebox.showerror("Error", "Patient is already admitted." if current else "No free bed available."), patient_id=patient_id)
+
+    def transfer_patient(self):
+        ward_name = self.ward_name_entry.get()
+        self.with_admission_patient(lambda patient_id: self.request("transfer", lambda bed: self.show_transfer(ward_name, bed), patient_id=patient_id, ward_name=ward_name))
+
+    def show_transfer(self, ward_name, bed):
+        if bed:
+            messagebox.showinfo("Success", f"Patient transferred to {ward_name}, bed {bed}.")
+            self.refresh_ward_list()
+        else:
+            messagebox.showerror("Error", "Transfer failed. Check the patient is admitted and the ward has a free bed.")
+
+    def discharge_patient(self):
+        self.with_admission_patient(lambda patient_id: self.request("discharge", self.show_discharge, patient_id=patient_id))
+
+    def show_discharge(self, discharged):
+        if discharged:
+            messagebox.showinfo("Success", "Patient discharged.")
+            self.refresh_ward_list()
+        else:
+            messagebox.showerror("Error", "Patient is not admitted.")
+
+    def create_dashboard_tab(self):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg  # Imported here: it alone takes most of a second
+        from matplotlib.figure import Figure
+        self.dashboard_figure = Figure(figsize=(8, 5), dpi=80)
+        self.dashboard_canvas = FigureCanvasTkAgg(self.dashboard_figure, master=self.dashboard_tab)
+        self.dashboard_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        tk.Button(self.dashboard_tab, text="Refresh Dashboard", command=self.refresh_dashboard, bg="#4db6ac", fg="white", font=("Arial", 12)).pack(pady=5)
+        # Ad-hoc questions over the full billing history
+        query_frame = tk.Frame(self.dashboard_tab)
+        query_frame.pack(pady=5)
+        tk.Label(query_frame, text="From (YYYY-MM-DD):", font=("Arial", 12)).pack(side=tk.LEFT)
+        self.revenue_start_entry = tk.Entry(query_frame, font=("Arial", 12), width=12)
+        self.revenue_start_entry.pack(side=tk.LEFT)
+        tk.Label(query_frame, text="To:", font=("Arial", 12)).pack(side=tk.LEFT)
+        self.revenue_end_entry = tk.Entry(query_frame, font=("Arial", 12), width=12)
+        self.revenue_end_entry.pack(side=tk.LEFT)
+        tk.Button(query_frame, text="Revenue", command=self.query_revenue, bg="#4db6ac", fg="white", font=("Arial", 12)).pack(side=tk.LEFT, padx=5)
+        tk.Button(query_frame, text="Top Patients", command=self.show_top_patients, bg="#4db6ac", fg="white", font=("Arial", 12)).pack(side=tk.LEFT)
+
+    def on_tab_changed(self, event):
+        tab = self.tab_control.select()
+        self.build_tab(tab)
+        if tab == str(self.dashboard_tab):
+            self.refresh_dashboard()
+
+    def refresh_dashboard(self):
+        self.request("get_dashboard", self.draw_dashboard)
+
+    def draw_dashboard(self, analytics):
+        # Charts are drawn from the cached aggregates only, so this costs the same at any data size
+        self.dashboard_figure.clear()
+        revenue_axes, specialization_axes, split_axes, ward_axes = self.dashboard_figure.subplots(2, 2).flat
+
+        revenue_axes.plot([datetime.fromisoformat(day).date() for day, _ in analytics["revenue_by_day"]], [revenue for _, revenue in analytics["revenue_by_day"]], marker="o", color="#00796b")
+        revenue_axes.set_title("Revenue per Day (last 30 days)")
+        revenue_axes.tick_params(axis="x", labelrotation=45, labelsize=7)
+
+        specializations = sorted(analytics["revenue_by_specialization"])
+        specialization_axes.bar(specializations, [analytics["revenue_by_specialization"][name] for name in specializations], color="#4db6ac")
+        specialization_axes.set_title("Revenue per Specialization")
+        specialization_axes.tick_params(axis="x", labelrotation=30, labelsize=7)
+
+        if analytics["registration_total"] or analytics["medicine_total"]:
+            split_axes.pie([analytics["registration_total"], analytics["medicine_total"]], labels=["Registration", "Medicine"], autopct="%1.0f%%", colors=["#ffcc00", "#4caf50"])
+        split_axes.set_title("Registration vs Medicine")
+
+        for ward_name, (times, occupied) in analytics["ward_occupancy"].items():
+            ward_axes.step([datetime.fromtimestamp(moment) for moment in times], occupied, where="post", label=ward_name)
+        if analytics["ward_occupancy"]:
+            ward_axes.legend(fontsize=7)
+        ward_axes.set_title("Ward Occupancy")
+        ward_axes.tick_params(axis="x", labelrotation=45, labelsize=7)
+
+        self.dashboard_figure.tight_layout()
+        self.dashboard_canvas.draw_idle()
+
+    def query_revenue(self):
+        # Both dates are optional; the end date is inclusive
+        try:
+            start, end = [datetime.strptime(entry.get(), '%Y-%m-%d') if entry.get() else None for entry in (self.revenue_start_entry, self.revenue_end_entry)]
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter dates as YYYY-MM-DD.")
+            return
+        self.request("query_revenue", lambda revenue: messagebox.showinfo("Revenue", f"Bills: {revenue['bills']}\nRegistration: {revenue['registration']}\nMedicine: {revenue['medicine']}\nTotal: {revenue['total']}"),
+                     start=start and start.strftime('%Y-%m-%d %H:%M'), end=end and (end + timedelta(days=1)).strftime('%Y-%m-%d %H:%M'))
+
+    def show_top_patients(self):
+        self.request("top_patients", lambda top: messagebox.showinfo("Top Patients", "\n".join(f"Patient ID: {patient_id}, Total Billed: {total}" for patient_id, total in top) or "No billing records available."))
 
     def show_ward_statistics(self):
-        ward_stats = "\n".join([f"Ward: {name}, Total Beds: {info['total_beds']}, Occupied Beds: {info['occupied_beds']}" for name, info in self.hms.get_wards().items()])
+        self.request("get_wards", self.show_ward_summary)
+
+    def show_ward_summary(self, wards):
+        ward_stats = "\n".join([f"Ward: {ward['ward_name']} ({ward['ward_type']}), Total Beds: {ward['total_beds']}, Occupied Beds: {ward['occupied_beds']}, Free Beds: {ward['free_beds']}" for ward in wards.values()])
         messagebox.showinfo("Ward Statistics", ward_stats if ward_stats else "No wards available.")
 
     def contact_support(self):
         messagebox.showinfo("Contact Support", "For support, please contact us at: support@hospital.com or call +1234567890.")
 
+    def create_diagnostics_tab(self):
+        controls = tk.Frame(self.diagnostics_tab)
+        controls.pack(fill=tk.X, padx=10, pady=5)
+        tk.Label(controls, text="Time every n-th call (0 = off):", font=("Arial", 12)).pack(side=tk.LEFT)
+        self.metrics_sample_entry = tk.Spinbox(controls, from_=0, to=1000, width=6, command=self.set_metrics_sampling)
+        self.metrics_sample_entry.delete(0, tk.END)
+        self.metrics_sample_entry.insert(0, str(METRICS.sample_every))
+        self.metrics_sample_entry.bind("<Return>", self.set_metrics_sampling)
+        self.metrics_sample_entry.pack(side=tk.LEFT, padx=5)
+        tk.Button(controls, text="Refresh", command=self.refresh_diagnostics, bg="#4db6ac", fg="white", font=("Arial", 12)).pack(side=tk.LEFT, padx=5)
+        tk.Button(controls, text="Export Metrics", command=self.export_metrics, bg="#4db6ac", fg="white", font=("Arial", 12)).pack(side=tk.LEFT, padx=5)
+        self.diagnostics_text = tk.Text(self.diagnostics_tab, font=("Courier", 10), wrap=tk.NONE)
+        self.diagnostics_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+    def toggle_diagnostics(self, event=None):
+        if self.tab_control.select() == str(self.diagnostics_tab):
+            self.tab_control.hide(self.diagnostics_tab)
+        else:
+            self.build_tab(self.diagnostics_tab)
+            self.tab_control.add(self.diagnostics_tab, text="Diagnostics")  # Also re-shows it after hide()
+            self.tab_control.select(self.diagnostics_tab)
+            self.refresh_diagnostics()
+
+    def set_metrics_sampling(self, event=None):
+        # Applies to this process, which includes the system when the window hosts its own service
+        value = self.metrics_sample_entry.get().strip()
+        if value.isdigit():
+            METRICS.sample_every = int(value)
+
+    def refresh_diagnostics(self):
+        lines = []
+        if not METRICS_SAMPLE_EVERY:
+            lines.append("Instrumentation was switched off at startup (HMS_METRICS=0).")
+        lines += metrics_table(METRICS.summary())
+        lines.append("")
+        lines.append(f"UI stalls (event loop blocked {STALL_THRESHOLD_MS} ms or more): {METRICS.stall_count}")
+        lines += [f"  {when:%H:%M:%S}  {seconds * 1000:7.0f} ms  {culprits}" for when, seconds, culprits in reversed(METRICS.stalls)]
+        self.show_diagnostics(lines)
+        if SERVICE_ADDRESS:  # A shared service keeps its own metrics
+            self.request("metrics", lambda rows: self.show_diagnostics(lines + ["", f"Service at {SERVICE_ADDRESS}:"] + metrics_table(rows)), self.report_service_error)
+
+    def show_diagnostics(self, lines):
+        self.diagnostics_text.delete("1.0", tk.END)
+        self.diagnostics_text.insert(tk.END, "\n".join(lines))
+
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(title="Export Metrics", defaultextension=".prom", filetypes=[("Prometheus text", "*.prom"), ("All files", "*.*")])
+        if path:
+            try:
+                METRICS.write(path)
+            except OSError as error:
+                messagebox.showerror("Export Error", str(error))
+
+    def export_metrics_periodically(self):
+        try:
+            METRICS.write(METRICS_FILE)
+        except OSError as error:
+            self.notification_listbox.insert(tk.END, f"Could not write metrics to {METRICS_FILE}: {error}")
+        self.main_app.after(METRICS_EXPORT_MS, self.export_metrics_periodically)
+
+# Every window handler is timed and reported in stall logs. Login and open_main_application are left out
+# because the latter runs the whole main loop; request only queues a call, and the service helpers run on
+# worker threads, where they would be blamed for stalls they cannot cause.
+instrument(App, "app", skip=("admin_login", "open_main_application", "request", "start_service", "call_service", "stop_service"), ui=True)
+
+def metrics_table(rows):
+    # Text table of Metrics.summary() rows for the diagnostics tab
+    lines = [f"{'Call':<40}{'Calls':>10}{'Timed':>10}{'p50 ms':>10}{'p99 ms':>10}{'Max ms':>10}"]
+    lines += [f"{name:<40}{calls:>10}{timed:>10}{p50 * 1000:>10.2f}{p99 * 1000:>10.2f}{maximum * 1000:>10.2f}" for name, calls, timed, p50, p99, maximum in rows]
+    return lines
+
+def parse_patient(row):
+    name, age, gender, ailment = row["name"].strip(), str(row["age"]).strip(), row["gender"].strip(), row["ailment"].strip()
+    priority = (row.get("priority") or "Normal").strip()
+    department = (row.get("department") or "General OPD").strip()
+    if not (name and age.isdigit() and gender and ailment):
+        raise ValueError("name, age (digits), gender and ailment are required")
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+    return (name, int(age), gender, ailment, priority, department)
+
+def parse_doctor(row):
+    name, specialization, contact = row["name"].strip(), row["specialization"].strip(), str(row["contact"]).strip()
+    if not (name and specialization and contact):
+        raise ValueError("name, specialization and contact are required")
+    return (name, specialization, contact)
+
+def parse_appointment(row):
+    patient_id, doctor_id, appointment_time = str(row["patient_id"]).strip(), str(row["doctor_id"]).strip(), row["appointment_time"].strip()
+    if not (patient_id.isdigit() and doctor_id.isdigit()):
+        raise ValueError("patient_id and doctor_id must be digits")
+    return (int(patient_id), int(doctor_id), parse_time(appointment_time))
+
+def parse_time(value):
+    # Fast path for the canonical zero-padded form; anything else goes through strptime as in the form
+    try:
+        if len(value) == 16 and value[4] == value[7] == "-" and value[10] == " " and value[13] == ":":
+            return datetime.fromisoformat(value)
+        return datetime.strptime(value, '%Y-%m-%d %H:%M')
+    except ValueError:
+        raise ValueError("appointment_time must be YYYY-MM-DD HH:MM")
+
+def parse_billing(row):
+    values = [str(row[field]).strip() for field in ("patient_id", "registration_charge", "medicine_cost")]
+    if not all(value.isdigit() for value in values):
+        raise ValueError("patient_id, registration_charge and medicine_cost must be digits")
+    billed_at = (row.get("billed_at") or "").strip()
+    return tuple(int(value) for value in values) + (parse_time(billed_at) if billed_at else None,)
+
+def parse_ward(row):
+    ward_name, total_beds = row["ward_name"].strip(), str(row["total_beds"]).strip()
+    ward_type = (row.get("ward_type") or "General").strip()
+    if not (ward_name and total_beds.isdigit()):
+        raise ValueError("ward_name and total_beds (digits) are required")
+    return (ward_name, int(total_beds), ward_type)
+
+def parse_text(row):
+    text = row["text"].strip()
+    if not text:
+        raise ValueError("text is required")
+    return (text,)
+
+# Entity -> (row parser, HospitalManagementSystem method, rejection message)
+IMPORTERS = {
+    "patients": (parse_patient, "add_patient", None),
+    "doctors": (parse_doctor, "add_doctor", None),
+    "appointments": (parse_appointment, "schedule_appointment", None),
+    "billing": (parse_billing, "add_billing", None),
+    "wards": (parse_ward, "add_ward", "ward already exists"),
+    "feedback": (parse_text, "add_feedback", None),
+    "complaints": (parse_text, "add_complaint", None),
+}
+
+# Entity -> (columns, rows); appointment times are written in the same format the forms accept
+EXPORTERS = {
+    "patients": (Patient.__slots__, lambda hms: hms.get_patients()),
+    "doctors": (Doctor.__slots__, lambda hms: hms.get_doctors()),
+    "appointments": (Appointment.__slots__, lambda hms: hms.get_appointments()),
+    "billing": (BillingRecord.__slots__ + ("total_cost",), lambda hms: hms.billing_records),
+    "wards": (("ward_name", "ward_type", "total_beds", "occupied_beds"), lambda hms: (ward.summary() for ward in hms.get_wards().values())),
+    "feedback": (("text",), lambda hms: ({"text": text} for text in hms.feedbacks)),
+    "complaints": (("text",), lambda hms: ({"text": text} for text in hms.complaints)),
+    "tokens": (Token.__slots__, lambda hms: hms.token_queue.waiting.values()),
+}
+
+def file_format(path, fmt):
+    return fmt or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+
+def read_rows(source, fmt):
+    # Yields (line number, row dict) one at a time so memory stays flat regardless of file size
+    if fmt == "jsonl":
+        for line_number, line in enumerate(source, 1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as error:
+                    yield line_number, error
+    else:
+        # csv.reader zipped with the header row costs half of what csv.DictReader does per row
+        reader = csv.reader(source)
+        header = next(reader, None)
+        for row in reader:
+            if row:  # Blank lines are skipped, as DictReader does
+                yield reader.line_num, dict(zip(header, row))
+
+def import_file(hms, entity, path, fmt=None, batch_size=5000, errors=sys.stderr, issue_tokens=False, on_batch=None):
+    # on_batch, if given, is called with the number of rows in each batch once it has been applied
+    parse, method, rejection = IMPORTERS[entity]
+    imported = failed = 0
+    batch, lines = [], []
+
+    def apply_batch():
+        rejected = hms.bulk(method, batch, tidy=False)
+        for position, reason in rejected:
+            print(f"{path}:{lines[position]}: {reason or rejection}", file=errors)
+        if on_batch is not None:
+            on_batch(len(batch))
+        batch.clear()
+        lines.clear()
+        return len(rejected)
+
+    # Parsed rows are tracked tuples too; pausing the collector for the whole file saves rescanning the stores
+    with collection_paused(), open(path, newline="", encoding="utf-8") as source:
+        for line_number, row in read_rows(source, file_format(path, fmt)):
+            try:
+                if isinstance(row, Exception):
+                    raise ValueError(f"invalid JSON: {row}")
+                args = parse(row)
+            except (ValueError, KeyError, AttributeError, TypeError) as error:
+                failed += 1
+                print(f"{path}:{line_number}: {error if not isinstance(error, KeyError) else f'missing column {error}'}", file=errors)
+                continue
+            if entity == "patients":
+                args += (issue_tokens,)
+            batch.append(args)
+            lines.append(line_number)
+            if len(batch) >= batch_size:
+                rejected = apply_batch()
+                imported += batch_size - rejected
+                failed += rejected
+        if batch:
+            size = len(batch)
+            rejected = apply_batch()
+            imported += size - rejected
+            failed += rejected
+    hms.tidy_name_indexes()  # Once for the whole file, so the first search after it stays fast
+    return imported, failed
+
+def export_file(hms, entity, path, fmt=None):
+    columns, rows = EXPORTERS[entity]
+    fmt = file_format(path, fmt)
+    exported = 0
+    with open(path, "w", newline="", encoding="utf-8") as target:
+        writer = csv.writer(target) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        with hms.reading():  # One consistent state even if other threads keep writing
+            for record in rows(hms):
+                values = [record[column] for column in columns]
+                values = [value.strftime('%Y-%m-%d %H:%M') if isinstance(value, datetime) else value for value in values]
+                if writer:
+                    writer.writerow(values)
+                else:
+                    target.write(json.dumps(dict(zip(columns, values))) + "\n")
+                exported += 1
+    return exported
+
+# Load-test request mix: (call, weight, JSON arguments built from a random generator and the patients added so far)
+LOAD_TEST_MIX = (
+    ("add_patient", 3, lambda rng, patients: {"name": f"Load {rng.randrange(10**6)}", "age": rng.randrange(1, 100), "gender": rng.choice(("Male", "Female")), "ailment": "Fever", "priority": rng.choice(PRIORITIES), "department": rng.choice(DEPARTMENTS)}),
+    ("get_patient", 3, lambda rng, patients: {"patient_id": rng.randrange(1, patients + 1)}),
+    ("page", 2, lambda rng, patients: {"entity": "patients", "start": -20}),  # A list view following the newest rows
+    ("get_token_stats", 1, lambda rng, patients: {}),
+    ("find_ward", 1, lambda rng, patients: {"ward_type": rng.choice(WARD_TYPES)}),
+)
+
+async def load_test_connection(host, port, count, rng, state, latencies, errors):
+    # One keep-alive client sending count requests back to back
+    import asyncio
+    reader, writer = await asyncio.open_connection(host, port)
+    calls = [call for call in LOAD_TEST_MIX for _ in range(call[1])]
+    try:
+        for _ in range(count):
+            name, _, arguments = rng.choice(calls)
+            body = json.dumps(arguments(rng, state["patients"])).encode()
+            started = time.perf_counter()
+            writer.write(b"POST /api/%s HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (name.encode(), host.encode(), len(body), body))
+            head = await reader.readuntil(b"\r\n\r\n")
+            status = int(head.split(b" ", 2)[1])
+            length = int(head.lower().split(b"content-length:", 1)[1].split(b"\r\n", 1)[0])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors[name] = errors.get(name, 0) + 1
+            elif name == "add_patient":
+                state["patients"] += 1
+    finally:
+        writer.close()
+
+async def load_test(address, connections=200, requests=20000, seed=1):
+    # Drives a service with concurrent keep-alive connections; returns throughput and latency percentiles
+    import asyncio
+    host, _, port = address.rpartition(":")
+    client = ServiceClient(address)
+    await asyncio.to_thread(client.call, "add_ward", ward_name=f"Load Ward {seed}", total_beds=50, ward_type="General")
+    state = {"patients": await asyncio.to_thread(client.call, "add_patient", name="Load Seed", age=30, gender="Male", ailment="Fever")}
+    latencies, errors = [], {}
+    per_connection, extra = divmod(requests, connections)
+    started = time.perf_counter()
+    await asyncio.gather(*(load_test_connection(host, int(port), per_connection + (index < extra), random.Random(seed * 100003 + index), state, latencies, errors) for index in range(connections)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {"requests": len(latencies), "connections": connections, "seconds": elapsed, "throughput": len(latencies) / max(elapsed, 1e-9), "p50_ms": percentile(latencies, 0.50) * 1000, "p99_ms": percentile(latencies, 0.99) * 1000, "max_ms": latencies[-1] * 1000 if latencies else 0.0, "errors": errors}
+
+def stress_test(threads=16, operations=40000, seed=1):
+    # Hammers one in-memory system from a thread pool with mixed writes and reads, then checks that no ID or
+    # token was handed out twice and that no update was lost. Returns (counts, list of failed checks).
+    hms = HospitalManagementSystem()
+    for number, ward_type in enumerate(WARD_TYPES):
+        hms.add_ward(f"Stress {number}", 25, ward_type)
+
+    def worker(index):
+        rng = random.Random(seed * 100003 + index)
+        patients, called, billed, admitted = [], [], 0, set()
+        for _ in range(operations // threads):
+            roll = rng.random()
+            if roll < 0.35 or not patients:
+                patients.append(hms.add_patient(f"Stress {index}", rng.randrange(1, 100), "Female", "Fever", rng.choice(PRIORITIES), rng.choice(DEPARTMENTS)))
+            elif roll < 0.5:
+                hms.add_billing(rng.choice(patients), 100, 50)
+                billed += 150
+            elif roll < 0.6:
+                token = hms.get_next_token(rng.choice([None] + DEPARTMENTS))
+                if token is not None:
+                    called.append(token)
+            elif roll < 0.7:
+                patient_id = rng.choice(patients)
+                if hms.admit(patient_id, ward_type=rng.choice([None] + WARD_TYPES)):
+                    admitted.add(patient_id)
+            elif roll < 0.75 and admitted:
+                patient_id = admitted.pop()
+                if not hms.discharge(patient_id):
+                    raise AssertionError(f"patient {patient_id} was admitted but could not be discharged")
+            else:
+                hms.get_patients()[-10:]
+                hms.get_token_stats()
+                hms.find_ward()
+        return patients, called, billed
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)  # Switch threads far more often than usual to shake out races
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(worker, range(threads)))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    patient_ids = [patient_id for patients, _, _ in results for patient_id in patients]
+    called = [token for _, tokens, _ in results for token in tokens]
+    billed = sum(amount for _, _, amount in results)
+    issued = [patient.token for patient in hms.patients]
+    failures = []
+    with hms.reading():
+        if len(set(patient_ids)) != len(patient_ids):
+            failures.append(f"{len(patient_ids) - len(set(patient_ids))} duplicate patient IDs")
+        if len(hms.patients) != len(patient_ids) or {patient.id for patient in hms.patients} != set(patient_ids):
+            failures.append(f"{len(patient_ids)} patients added but {len(hms.patients)} stored")
+        if len(set(issued)) != len(issued):
+            failures.append(f"{len(issued) - len(set(issued))} duplicate tokens")
+        if len(set(called)) != len(called) or len(called) + len(hms.token_queue) != len(issued):
+            failures.append(f"{len(issued)} tokens issued but {len(called)} called and {len(hms.token_queue)} waiting")
+        if hms.analytics.registration_total + hms.analytics.medicine_total != billed:
+            failures.append(f"billed {billed} but analytics saw {hms.analytics.registration_total + hms.analytics.medicine_total}")
+        if len(hms.billing_records) * 150 != billed:
+            failures.append(f"billed {billed} but {len(hms.billing_records)} bills stored")
+        if sum(ward.occupied_beds for ward in hms.wards.values()) != len(hms.admissions):
+            failures.append(f"{len(hms.admissions)} admissions but {sum(ward.occupied_beds for ward in hms.wards.values())} beds occupied")
+    counts = {"patients": len(patient_ids), "tokens_called": len(called), "bills": len(hms.billing_records), "admitted": len(hms.admissions)}
+    return counts, failures
+
+# Benchmark workload: first appointment day (a Monday, far enough ahead that reminders are never in the past),
+# the lists whose refresh is timed when a display is available, and what counts as a regression
+BENCH_START = datetime(2030, 1, 7)
+BENCH_SCALES = (10_000, 100_000, 1_000_000)
+BENCH_NAMES = ("Aarav", "Ananya", "Arjun", "Diya", "Ishaan", "Kavya", "Meera", "Neha", "Rahul", "Riya", "Rohan", "Sanya", "Vikram", "Zara")
+BENCH_AILMENTS = ("Fever", "Cold", "Flu", "Fracture", "Diabetes", "Hypertension", "Migraine", "Asthma")
+BENCH_LISTS = (("refresh_patient_list", "patients"), ("refresh_doctor_list", "doctors"), ("refresh_token_list", "tokens"), ("refresh_ward_list", "wards"))
+BENCH_TOLERANCE = 0.25  # Flag a latency or memory increase (or throughput drop) of more than 25%
+BENCH_NOISE_MS = 0.05  # Latency changes smaller than this are timer noise, never regressions
+BENCH_IMPORT_ROWS = 200_000  # Most patients the import benchmark writes and imports per scale
+
+def percentile(values, fraction):
+    # values must be sorted
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+def peak_memory_mb():
+    # Peak resident set size of this process so far, or None where the resource module is missing (Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # Bytes on macOS, kilobytes elsewhere
+
+def appointment_slot(number, start=BENCH_START):
+    # The number-th slot on the working grid counted from start, skipping closed days
+    per_day = (WORKING_HOURS[1] - WORKING_HOURS[0]) // SLOT_MINUTES
+    day, slot = divmod(number, per_day)
+    week, day = divmod(day, len(WORKING_DAYS))
+    date = start + timedelta(weeks=week)
+    date += timedelta(days=(sorted(WORKING_DAYS)[day] - date.weekday()) % 7)
+    return date + timedelta(minutes=WORKING_HOURS[0] + slot * SLOT_MINUTES)
+
+def generate_workload(hms, scale, seed=1):
+    # Fills an empty system with a seeded hospital of scale patients: scale // 100 doctors, one token, one
+    # appointment and one bill per patient, and scale // 1000 wards about 70% occupied. Same seed, same hospital.
+    rng = random.Random(seed)
+    doctors = max(10, scale // 100)
+    hms.bulk("add_doctor", ((f"Dr. {rng.choice(BENCH_NAMES)} {number}", DEPARTMENTS[number % len(DEPARTMENTS)], f"98{rng.randrange(10**8):08d}") for number in range(doctors)))
+    hms.bulk("add_patient", ((f"{rng.choice(BENCH_NAMES)} {number}", rng.randrange(1, 100), rng.choice(("Male", "Female")), rng.choice(BENCH_AILMENTS), rng.choices(PRIORITIES, (1, 3, 16))[0], rng.choice(DEPARTMENTS)) for number in range(scale)))
+    hms.bulk("schedule_appointment", ((patient_id, patient_id % doctors + 1, appointment_slot((patient_id - 1) // doctors)) for patient_id in range(1, scale + 1)))
+    hms.bulk("add_billing", ((patient_id, rng.choice((100, 200, 500)), rng.randrange(5000), BENCH_START - timedelta(minutes=rng.randrange(90 * 1440))) for patient_id in range(1, scale + 1)))
+    hms.bulk("add_ward", ((f"Ward {number}", rng.randrange(20, 61), WARD_TYPES[number % len(WARD_TYPES)]) for number in range(max(len(WARD_TYPES), scale // 1000))))
+    beds = sum(ward.total_beds for ward in hms.wards.values())
+    hms.bulk("admit", ((patient_id,) for patient_id in range(1, min(scale, beds * 7 // 10) + 1)))
+    return doctors
+
+def bench_operations(hms, scale, doctors, operations, seed=1):
+    # Times each core call operations times on a generated system; returns {call: sorted latencies in seconds}
+    rng = random.Random(seed)
+    reminders = []
+    hms.set_reminder_sink(reminders.append)  # Stands in for the window's reminder popups
+    first_slot = (scale - 1) // doctors + 1  # First slot number no generated appointment uses
+    reminder_times = [appointment_slot(0) - timedelta(days=1) + (appointment_slot(first_slot) - appointment_slot(0)) * number / operations for number in range(operations)]
+    free_wards = [ward.name for ward in hms.wards.values()]
+    admitted = set(hms.admissions)
+    calls = {
+        "add_patient": lambda number: hms.add_patient(f"{rng.choice(BENCH_NAMES)} {scale + number}", rng.randrange(1, 100), "Female", rng.choice(BENCH_AILMENTS), rng.choice(PRIORITIES), rng.choice(DEPARTMENTS)),
+        "schedule_appointment": lambda number: hms.schedule_appointment(number % scale + 1, number % doctors + 1, appointment_slot(first_slot + number // doctors)),
+        "send_reminder": lambda number: hms.send_reminder(reminder_times[number]),
+        "get_next_token": lambda number: hms.get_next_token(rng.choice([None] + DEPARTMENTS)),
+        "print_receipt": lambda number: (hms.get_patient(rng.randrange(1, scale + 1)), next(iter(hms.billing_for(rng.randrange(1, scale + 1))), None)),
+        "assign_bed": lambda number: hms.assign_bed(rng.choice(free_wards), scale - number),
+        "search_patients": lambda number: hms.search_patients(prefix=rng.choice(BENCH_NAMES)[:2], ailment=rng.choice(BENCH_AILMENTS)),
+    }
+    results = {}
+    for name, call in calls.items():
+        latencies = []
+        for number in range(operations):
+            started = time.perf_counter()
+            call(number)
+            latencies.append(time.perf_counter() - started)
+            if name == "assign_bed" and scale - number not in admitted:
+                hms.discharge(scale - number)  # Keep occupancy where the generator left it
+        latencies.sort()
+        results[name] = latencies
+    return results
+
+def bench_refresh(hms, operations, seed=1):
+    # Times a list refresh as the window does it: one "page" call to the service and a redraw of the visible
+    # rows. Needs Tk and a display (a virtual one such as xvfb-run will do); returns None without them.
+    try:
+        load_tk()
+    except ImportError:
+        return None
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    root.withdraw()
+    rng = random.Random(seed)
+    service = ServiceThread(hms).start()
+    client = ServiceClient(service.address)
+    results = {}
+    try:
+        for name, entity in BENCH_LISTS:
+            page = client.call("page", entity=entity, start=0, stop=1)
+            columns = tuple(page["rows"][0]) if page["rows"] and isinstance(page["rows"][0], dict) else ("Value",)
+            view = VirtualListView(root, columns, lambda: page["total"], lambda start, stop: [tuple(row.values()) if isinstance(row, dict) else (row,) for row in page["rows"][start - page["start"]:stop - page["start"]]])
+            view.follow_tail = False
+            latencies = []
+            for _ in range(operations):
+                offset = rng.randrange(max(1, page["total"] - view.height + 1))
+                started = time.perf_counter()
+                page = client.call("page", entity=entity, start=offset, stop=offset + view.height)
+                view.scroll_to(offset)
+                root.update_idletasks()
+                latencies.append(time.perf_counter() - started)
+            latencies.sort()
+            results[name] = latencies
+    finally:
+        service.stop()
+        root.destroy()
+    return results
+
+def bench_startup(runs=5):
+    # Launch until the login window could be built: a fresh interpreter loading this file and Tk (where it is
+    # installed) without opening any window (that needs a display; the app reports it as startup.login_window)
+    import subprocess
+    command = [sys.executable, "-c", f"import runpy\nload_tk = runpy.run_path({os.path.abspath(__file__)!r})['load_tk']\ntry:\n    load_tk()\nexcept ImportError:\n    pass"]
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, check=True)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return latencies
+
+def bench_import(scale, seed=1, entity="patients"):
+    # Writes a seeded patients or appointments CSV and imports it into a throwaway journal exactly as the
+    # import command does. Each batch's time (reading, parsing, adding and persisting) is spread over its
+    # rows, so the result is one per-row latency per imported row, sorted, and its throughput is rows per
+    # second. Appointments are booked for patients and doctors added untimed beforehand.
+    import shutil
+    import tempfile
+    rng = random.Random(seed)
+    rows = min(scale, BENCH_IMPORT_ROWS)
+    doctors = max(10, rows // 100)
+    directory = tempfile.mkdtemp(prefix="hms-bench-")
+    try:
+        path = os.path.join(directory, f"{entity}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as target:
+            writer = csv.writer(target)
+            if entity == "appointments":
+                writer.writerow(("patient_id", "doctor_id", "appointment_time"))
+                writer.writerows((patient_id, patient_id % doctors + 1, f"{appointment_slot((patient_id - 1) // doctors):%Y-%m-%d %H:%M}") for patient_id in range(1, rows + 1))
+            else:
+                writer.writerow(("name", "age", "gender", "ailment"))
+                writer.writerows((f"{rng.choice(BENCH_NAMES)} {number}", rng.randrange(1, 100), rng.choice(("Male", "Female")), rng.choice(BENCH_AILMENTS)) for number in range(rows))
+        hms = HospitalManagementSystem(JournalBackend(os.path.join(directory, "journal")))
+        if entity == "appointments":
+            hms.bulk("add_doctor", ((f"Dr. {rng.choice(BENCH_NAMES)} {number}", DEPARTMENTS[number % len(DEPARTMENTS)], f"98{rng.randrange(10**8):08d}") for number in range(doctors)))
+            hms.bulk("add_patient", ((f"{rng.choice(BENCH_NAMES)} {number}", rng.randrange(1, 100), rng.choice(("Male", "Female")), rng.choice(BENCH_AILMENTS)) for number in range(rows)))
+        latencies = []
+        last = time.perf_counter()
+        def on_batch(rows):
+            nonlocal last
+            now = time.perf_counter()
+            latencies.extend([(now - last) / rows] * rows)
+            last = now
+        import_file(hms, entity, path, on_batch=on_batch)
+        hms.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    latencies.sort()
+    return latencies
+
+def latency_stats(latencies):
+    # latencies must be sorted
+    return {"count": len(latencies), "throughput": len(latencies) / max(sum(latencies), 1e-9), "p50_ms": percentile(latencies, 0.50) * 1000, "p99_ms": percentile(latencies, 0.99) * 1000}
+
+def run_benchmarks(scales=BENCH_SCALES, operations=2000, seed=1, report=print):
+    # Times startup, then generates each scale in a fresh in-memory system and times it; returns a
+    # JSON-ready result dict
+    results = {"seed": seed, "operations": operations, "python": sys.version.split()[0], "scales": {}}
+    launch = latency_stats(bench_startup())
+    results["startup"] = {"peak_memory_mb": None, "operations": {"launch": launch}}
+    report(f"Startup: launch to login-ready p50 {launch['p50_ms']:.0f} ms, p99 {launch['p99_ms']:.0f} ms (target {LOGIN_TARGET_SECONDS * 1000:.0f} ms)" + (" OVER TARGET" if launch["p50_ms"] > LOGIN_TARGET_SECONDS * 1000 else ""))
+    for scale in scales:
+        imports = {f"import_{entity}": bench_import(scale, seed, entity) for entity in ("patients", "appointments")}
+        hms = HospitalManagementSystem()
+        started = time.perf_counter()
+        doctors = generate_workload(hms, scale, seed)
+        setup = time.perf_counter() - started
+        timings = bench_operations(hms, scale, doctors, operations, seed)
+        timings.update(imports)
+        refresh = bench_refresh(hms, min(operations, 200), seed)
+        timings.update(refresh or {})
+        entry = results["scales"][str(scale)] = {"setup_seconds": setup, "peak_memory_mb": peak_memory_mb(), "operations": {}}
+        for name, latencies in timings.items():
+            entry["operations"][name] = latency_stats(latencies)
+        memory = f"{entry['peak_memory_mb']:,.0f} MB" if entry["peak_memory_mb"] is not None else "unknown"
+        report(f"{scale:,} patients: generated in {setup:.1f}s, peak memory {memory}")
+        for name, stats in entry["operations"].items():
+            report(f"  {name:<22} {stats['throughput']:>12,.0f} ops/s  p50 {stats['p50_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms")
+        if refresh is None:
+            report("  refresh_* lists skipped: no Tk or display (try xvfb-run)")
+        del hms
+    return results
+
+def compare_benchmarks(baseline, results, tolerance=BENCH_TOLERANCE):
+    # Returns one line per regression against a baseline from run_benchmarks; scales or calls missing on
+    # either side are skipped
+    regressions = []
+    entries = [(scale, entry, baseline["scales"].get(scale)) for scale, entry in results["scales"].items()]
+    entries.append(("startup", results.get("startup"), baseline.get("startup")))
+    for scale, entry, base in entries:
+        if entry is None or base is None:
+            continue
+        if entry["peak_memory_mb"] and base["peak_memory_mb"] and entry["peak_memory_mb"] > base["peak_memory_mb"] * (1 + tolerance):
+            regressions.append(f"{scale}: peak memory {base['peak_memory_mb']:,.0f} -> {entry['peak_memory_mb']:,.0f} MB")
+        for name, stats in entry["operations"].items():
+            old = base["operations"].get(name)
+            if old is None:
+                continue
+            for field in ("p50_ms", "p99_ms"):
+                if stats[field] > old[field] * (1 + tolerance) and stats[field] - old[field] > BENCH_NOISE_MS:
+                    regressions.append(f"{scale} {name}: {field[:3]} {old[field]:.3f} -> {stats[field]:.3f} ms")
+            if stats["throughput"] * (1 + tolerance) < old["throughput"] and 1000 / stats["throughput"] - 1000 / old["throughput"] > BENCH_NOISE_MS:
+                regressions.append(f"{scale} {name}: throughput {old['throughput']:,.0f} -> {stats['throughput']:,.0f} ops/s")
+    return regressions
+
+def main(argv):
+    # Headless mode: python "The PyCoderd.py" import|export <entity> <file>, serve, loadtest, stress or bench
+    parser = argparse.ArgumentParser(description="Hospital Management System batch mode")
+    parser.add_argument("--storage", choices=["journal", "sqlite"], default=STORAGE)
+    parser.add_argument("--path", help="journal directory or SQLite file (defaults next to this script)")
+    parser.add_argument("--columnar", action="store_true", default=COLUMNAR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_command = commands.add_parser("import", help="stream CSV/JSONL rows into the system")
+    import_command.add_argument("entity", choices=sorted(IMPORTERS))
+    import_command.add_argument("file")
+    import_command.add_argument("--format", choices=["csv", "jsonl"])
+    import_command.add_argument("--batch-size", type=int, default=5000)
+    import_command.add_argument("--issue-tokens", action="store_true", help="queue a token for each imported patient")
+    export_command = commands.add_parser("export", help="stream every record of an entity to CSV/JSONL")
+    export_command.add_argument("entity", choices=sorted(EXPORTERS))
+    export_command.add_argument("file")
+    export_command.add_argument("--format", choices=["csv", "jsonl"])
+    serve_command = commands.add_parser("serve", help="share the system with several desks over local HTTP/JSON")
+    serve_command.add_argument("--host", default=SERVICE_HOST)
+    serve_command.add_argument("--port", type=int, default=SERVICE_PORT)
+    serve_command.add_argument("--metrics-file", help="keep a Prometheus text file of call metrics up to date")
+    load_command = commands.add_parser("loadtest", help="measure a service under concurrent keep-alive clients")
+    load_command.add_argument("--address", help="host:port of a running service (default: a throwaway in-memory one)")
+    load_command.add_argument("--connections", type=int, default=200)
+    load_command.add_argument("--requests", type=int, default=20000)
+    load_command.add_argument("--seed", type=int, default=1)
+    stress_command = commands.add_parser("stress", help="check the core stays consistent under many threads")
+    stress_command.add_argument("--threads", type=int, default=16)
+    stress_command.add_argument("--operations", type=int, default=40000)
+    stress_command.add_argument("--seed", type=int, default=1)
+    bench_command = commands.add_parser("bench", help="time core calls on generated hospitals of several sizes")
+    bench_command.add_argument("--scales", type=int, nargs="+", default=list(BENCH_SCALES), help="patients per generated hospital")
+    bench_command.add_argument("--operations", type=int, default=2000, help="timed calls of each kind per scale")
+    bench_command.add_argument("--seed", type=int, default=1)
+    bench_command.add_argument("--save", help="write the results as a JSON baseline")
+    bench_command.add_argument("--compare", help="baseline JSON to check the results against")
+    bench_command.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE, help="allowed slowdown before flagging, as a fraction")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        baseline = None
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as source:
+                baseline = json.load(source)
+        results = run_benchmarks(args.scales, args.operations, args.seed)
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as target:
+                json.dump(results, target, indent=2)
+        if baseline is None:
+            return 0
+        regressions = compare_benchmarks(baseline, results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        print(f"{len(regressions)} regressions against {args.compare}" if regressions else f"No regressions against {args.compare}")
+        return 1 if regressions else 0
+
+    if args.command == "stress":
+        started = time.perf_counter()
+        counts, failures = stress_test(args.threads, args.operations, args.seed)
+        print(f"{args.operations} operations on {args.threads} threads in {time.perf_counter() - started:.2f}s: " + ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items()))
+        for failure in failures:
+            print(f"FAILED: {failure}")
+        return 1 if failures else 0
+
+    if args.command == "loadtest":
+        import asyncio
+        service = None if args.address else ServiceThread(HospitalManagementSystem()).start()
+        try:
+            result = asyncio.run(load_test(args.address or service.address, args.connections, args.requests, args.seed))
+        finally:
+            if service is not None:
+                service.stop()
+        print(f"{result['requests']} requests over {result['connections']} connections in {result['seconds']:.2f}s: {result['throughput']:,.0f} req/s, p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, max {result['max_ms']:.2f} ms")
+        if result["errors"]:
+            print(f"Errors: {result['errors']}")
+        return 1 if result["errors"] else 0
+
+    try:
+        hms = HospitalManagementSystem(make_backend(args.storage, args.path), columnar=args.columnar)
+    except StorageInUseError as error:
+        print(error, file=sys.stderr)
+        return 1
+    started = time.perf_counter()
+    try:
+        if args.command == "serve":
+            import asyncio
+            service = HMSService(hms, args.host, args.port, args.metrics_file)
+            print(f"Serving on http://{args.host}:{args.port} (Ctrl+C to stop)")
+            try:
+                asyncio.run(service.run())
+            except KeyboardInterrupt:
+                pass
+            return 0
+        if args.command == "import":
+            imported, failed = import_file(hms, args.entity, args.file, args.format, args.batch_size, issue_tokens=args.issue_tokens)
+            elapsed = time.perf_counter() - started
+            print(f"Imported {imported} {args.entity}, {failed} rejected in {elapsed:.2f}s ({(imported + failed) / max(elapsed, 1e-9):,.0f} rows/s)")
+            return 1 if failed else 0
+        exported = export_file(hms, args.entity, args.file, args.format)
+        elapsed = time.perf_counter() - started
+        print(f"Exported {exported} {args.entity} in {elapsed:.2f}s ({exported / max(elapsed, 1e-9):,.0f} rows/s)")
+        return 0
+    finally:
+        hms.close()
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(main(sys.argv[1:]))
+    load_tk()
     root = tk.Tk()
     app = App(root)
     root.mainloop()
\ No newline at end of file